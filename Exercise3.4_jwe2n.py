@@ -17,6 +17,8 @@ Created on Mon Feb 21 10:44:07 2022
 import matplotlib.pyplot as plt
 import numpy as np
 
+from bayes_linreg import BayesianLinearRegression, polynomial_basis
+
 
 # true signal curve
 x = np.arange(0, 2, 10**-4)
@@ -46,8 +48,7 @@ n = np.sqrt(sigma_eta) * np.random.normal(0,1,N)
 theta_true = np.asarray([.2, -1, .9, .7, -.2])
 
 # compute the measurement matrix
-Phi = np.transpose(np.vstack([np.ones(N), x1, x1**2, x1**3, x1**5]))
-Phi_gram = np.matmul(np.transpose(Phi),Phi)
+Phi = polynomial_basis(x1, degrees=(0, 1, 2, 3, 5))
 
 # generate noisy observations using the linear model
 y1 = np.matmul(Phi, theta_true) + n
@@ -55,17 +56,10 @@ y1 = np.matmul(Phi, theta_true) + n
 # EM algorithm
 # initializate parameters
 # experiment on different initializations
-EMiter = 20
-betaj = 1
-sigma_eta_EM = np.ones(EMiter)
-alphaj = 1
-Phiy = np.matmul(np.transpose(Phi), y1)
-for i in range(EMiter):
-    Sigma_theta = np.linalg.inv(betaj * Phi_gram + alphaj * np.identity(K))
-    mu_theta = betaj * np.matmul(Sigma_theta, Phiy)
-    alphaj = K / (np.linalg.norm(mu_theta)**2 + np.trace(Sigma_theta))
-    betaj = N / (np.linalg.norm(y1 - np.matmul(Phi, mu_theta))**2 + np.trace(np.matmul(Sigma_theta, Phi_gram)))
-    sigma_eta_EM[i] = 1 / betaj
+# iterates until alpha and beta change by less than tol (at most max_iter times)
+model = BayesianLinearRegression(alpha=1, beta=1, max_iter=500, tol=1e-8).fit(Phi, y1)
+print(f"EM converged={model.converged_} after {model.n_iter_} iterations: "
+      f"alpha={model.alpha_:.4g}, noise variance={model.noise_var_:.4g} (true {sigma_eta})")
 
 # perform prediction on new samples
 Np = 10
@@ -74,11 +68,14 @@ Np = 10
 x2 = (b-a) * np.random.uniform(0,1,Np)
 
 # compute prediction measurement matrix
-Phip = np.transpose(np.vstack([np.ones(Np), x2, x2**2, x2**3, x2**5]))
+Phip = polynomial_basis(x2, degrees=(0, 1, 2, 3, 5))
 
 # compute the predicted mean and variance
-y_pred = np.matmul(Phip, mu_theta)
-y_pred_var = np.diag(sigma_eta_EM[-1] + np.linalg.multi_dot([sigma_eta_EM[-1] * 1/alphaj * Phip, np.linalg.inv(sigma_eta_EM[-1] * np.identity(K) + 1/alphaj * Phi_gram ), np.transpose(Phip)]))
+y_pred, y_pred_var = model.predict(Phip, return_var=True)
+
+# 95% credible intervals at the prediction samples and along the whole true-curve grid
+_, y_pred_lo, y_pred_hi = model.predict_interval(Phip, level=0.95)
+y_grid, y_grid_lo, y_grid_hi = model.predict_interval(polynomial_basis(x, degrees=(0, 1, 2, 3, 5)))
 
 # plot the predictions along the condifence intervals
 #figure
@@ -89,8 +86,9 @@ y_pred_var = np.diag(sigma_eta_EM[-1] + np.linalg.multi_dot([sigma_eta_EM[-1] *
 #xlabel('x'); ylabel('y')
 
 plt.plot(x, y, color='k', linewidth=0.5)
+plt.fill_between(x, y_grid_lo, y_grid_hi, color='r', alpha=0.15, linewidth=0)
 plt.plot(x2, y_pred, 'x', color='k', markersize=6)
-plt.errorbar(x2, y_pred, yerr=y_pred_var, fmt='none',color='r', linewidth=0.5, capsize=3)
+plt.errorbar(x2, y_pred, yerr=[y_pred - y_pred_lo, y_pred_hi - y_pred], fmt='none',color='r', linewidth=0.5, capsize=3)
 plt.xlabel('x')
 plt.ylabel('y')
 plt.axis([a,b,np.min(y),np.max(y)])
@@ -1,25 +1,39 @@
-import re
-import pandas as pd
-import nltk
 from pandas import *
 
-response='https://www.transit.dot.gov/sites/fta.dot.gov/files/2020-10/2019%20Facility%20Inventory.xlsx'
-response
-df=pd.read_excel(response)
-df
+from facility_inventory import load_inventory
+from facility_notes import extract_note_years, year_disagreement_report
+from facility_note_tokens import tokenize_notes
+from facility_note_tags import tag_notes, tags_frame, tags_by_agency
+from facility_note_index import NoteIndex
 
-al=df[['Agency Name','Year Built','Condition Assessment Date','Notes']]
-Notes_only=al[al.Notes.notnull()]
-Notes_only
-#Notes_only #6474 facilities have associated notes
+if __name__=='__main__': #the tokenizer's worker processes re-import this script
+    #2019 Facility Inventory: the workbook is streamed once into a cached columnar file,
+    #later runs open the cache instead of re-parsing the Excel file
+    al=load_inventory(2019)
+    al
+    Notes_only=al[al.Notes.notnull()]
+    Notes_only
+    #Notes_only #6474 facilities have associated notes
 
-#Useful Life Using Regex Tokenization
+    #Useful Life Using Regex Tokenization
 
-Notes_year=Notes_only[Notes_only['Notes'].str.contains('[0-9]{4}')] #497 have rows that are probably years
-Notes_year
-Year_Note=re.findall('\S[0-9]{4}',Notes_only['Notes'][1])
-comparison=Notes_year['Year Built'] - Notes_year['[0-9]{4}']
-Notes_only['Notes']
+    Notes_year=extract_note_years(Notes_only) #every plausible year mentioned in a note, one row per mention
+    Notes_year
+    comparison=year_disagreement_report(Notes_only,Notes_year) #note years vs Year Built and Condition Assessment Date
+    comparison[comparison.predates_built | comparison.after_assessment]
+    Notes_only['Notes']
 
+    #Tags: renovation/replacement/assessment/disposal/year patterns, all matched in one pass
+    Tag_matrix,Tag_labels=tag_notes(Notes_only['Notes'])
+    Notes_tags=Notes_only[['Agency Name','Notes']].join(tags_frame(Tag_matrix,Tag_labels,Notes_only.index))
+    Notes_tags
+    tags_by_agency(Notes_only,Tag_matrix,Tag_labels)
 
+    #Tokens: normalized, stopwords removed, unigrams + bigrams; cached by note hash so reruns are instant
+    Notes_tokens=tokenize_notes(Notes_only['Notes'])
+    Notes_tokens.explode().value_counts().head(30)
 
+    #Similarity: sparse TF-IDF index over the note tokens, ids are (inventory year, row); top 5 notes most like each of the first three
+    Notes_index=NoteIndex()
+    Notes_index.add(Notes_tokens.tolist(),[(2019,int(i)) for i in Notes_tokens.index])
+    Notes_index.query(Notes_tokens.head(3).tolist(),k=5)
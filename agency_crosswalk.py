@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Agency Crosswalk: Facility Inventory <-> Major Safety Events
+Matches agency spellings between the two datasets with normalized keys, then fuzzy matching
+restricted to names that share a rare token (blocking), so matching stays sub-quadratic.
+The crosswalk is cached as an editable CSV and only new agency names are matched on later runs
+
+Example:
+    python agency_crosswalk.py 2019 --store fta_events.sqlite
+"""
+
+import argparse
+import difflib
+import logging
+import os
+import re
+from collections import defaultdict
+
+DEFAULT_CROSSWALK = os.path.join('.facility_cache', 'agency_crosswalk.csv')
+
+# Spelling variants collapsed to one form before matching
+ABBREVIATIONS = {
+    'AUTHORITY': 'AUTH', 'DEPARTMENT': 'DEPT', 'DEPARTMENTS': 'DEPT',
+    'TRANSPORTATION': 'TRANSP', 'TRANSPORT': 'TRANSP', 'TRANS': 'TRANSP',
+    'DISTRICT': 'DIST', 'CORPORATION': 'CORP', 'COMPANY': 'CO', 'COUNTY': 'CNTY',
+    'METROPOLITAN': 'METRO', 'REGIONAL': 'REG', 'REGION': 'REG', 'SAINT': 'ST',
+    'AND': '&', 'NY': 'NEW YORK', 'NYC': 'NEW YORK CITY', 'NJ': 'NEW JERSEY',
+}
+
+# Words that carry no identity
+NOISE_WORDS = {'THE', 'OF', 'INC', 'LLC', 'DBA', 'CORP', 'CO', '&'}
+
+# Tokens shared by more than this many inventory names are too common to block on
+MAX_BLOCK_SIZE = 50
+MIN_SCORE = 0.85
+
+def normalize_agency(names):
+    """Normalized matching keys for a Series of agency names (vectorized)"""
+    keys = (names.fillna('').astype(str).str.upper()
+            .str.replace(r'\(.*?\)', ' ', regex=True)      # parenthetical acronyms/notes
+            .str.replace(r'[^A-Z0-9& ]+', ' ', regex=True)
+            .str.split())
+    expanded = keys.map(lambda words: ' '.join(ABBREVIATIONS.get(w, w) for w in words).split())
+    return expanded.map(lambda words: ' '.join(w for w in words if w not in NOISE_WORDS))
+
+def _block_tokens(key, raw_name=''):
+    """Tokens a name can be found by: its words, its acronym and any parenthetical acronym"""
+    words = key.split()
+    tokens = set(words)
+    if len(words) > 1:
+        tokens.add(''.join(w[0] for w in words))
+    tokens.update(re.findall(r'\(([A-Z0-9]{2,})\)', str(raw_name).upper()))
+    return tokens
+
+def build_block_index(keys, raw_names):
+    """Inverted index token -> inventory keys, dropping tokens too common to discriminate"""
+    index = defaultdict(set)
+    for key, raw in zip(keys, raw_names):
+        for token in _block_tokens(key, raw):
+            index[token].add(key)
+    return {token: ks for token, ks in index.items() if len(ks) <= MAX_BLOCK_SIZE}
+
+def match_agencies(event_agencies, inventory_agencies, min_score=MIN_SCORE):
+    """Crosswalk rows for each event agency name: exact key match, else best fuzzy candidate"""
+    import pandas as pd
+
+    inventory = pd.DataFrame({'inventory_agency': pd.unique(inventory_agencies.dropna())})
+    inventory['key'] = normalize_agency(inventory['inventory_agency'])
+    by_key = inventory.drop_duplicates('key').set_index('key')['inventory_agency']
+    block_index = build_block_index(inventory['key'], inventory['inventory_agency'])
+
+    # Single-word names like "WMATA" are matched against inventory acronyms
+    acronyms = defaultdict(set)
+    for key, raw in zip(inventory['key'], inventory['inventory_agency']):
+        for token in _block_tokens(key, raw) - set(key.split()):
+            acronyms[token].add(key)
+
+    events = pd.DataFrame({'event_agency': pd.unique(event_agencies.dropna())})
+    events['key'] = normalize_agency(events['event_agency'])
+
+    rows = []
+    for name, key in zip(events['event_agency'], events['key']):
+        if key in by_key.index:
+            rows.append((name, key, by_key[key], 1.0, 'exact'))
+            continue
+        if len(acronyms.get(key, ())) == 1:
+            rows.append((name, key, by_key[next(iter(acronyms[key]))], 1.0, 'acronym'))
+            continue
+
+        candidates = set()
+        for token in _block_tokens(key, name):
+            candidates |= block_index.get(token, set())
+
+        best, best_score = None, 0.0
+        for candidate in candidates:
+            score = difflib.SequenceMatcher(None, key, candidate).ratio()
+            if score > best_score:
+                best, best_score = candidate, score
+
+        if best is not None and best_score >= min_score:
+            rows.append((name, key, by_key[best], round(best_score, 3), 'fuzzy'))
+        else:
+            rows.append((name, key, None, round(best_score, 3), 'unmatched'))
+
+    crosswalk = pd.DataFrame(rows, columns=['event_agency', 'key', 'inventory_agency',
+                                            'score', 'method'])
+    if len(crosswalk):
+        logging.info("Crosswalk: " + ', '.join(f"{n} {m}" for m, n in
+                                              crosswalk['method'].value_counts().items()))
+    return crosswalk
+
+def update_crosswalk(event_agencies, inventory_agencies, path=DEFAULT_CROSSWALK, refresh=False):
+    """Load the cached crosswalk and match only agency names it hasn't seen
+
+    Previously unmatched names are retried, since new inventory years may add their agency.
+    Rows edited by hand in the CSV (e.g. method 'manual') are kept as-is.
+    """
+    import pandas as pd
+
+    cached = None
+    if os.path.exists(path) and not refresh:
+        cached = pd.read_csv(path, dtype={'event_agency': str, 'inventory_agency': str})
+        cached = cached[cached['method'] != 'unmatched']
+        seen = set(cached['event_agency'])
+        event_agencies = event_agencies[~event_agencies.isin(seen)]
+
+    new_rows = match_agencies(event_agencies, inventory_agencies)
+    crosswalk = pd.concat([cached, new_rows], ignore_index=True) if cached is not None else new_rows
+
+    if len(new_rows) or cached is None:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        crosswalk.to_csv(path, index=False)
+        logging.info(f"Crosswalk saved to {path} ({len(new_rows)} new agencies)")
+    return crosswalk
+
+def facility_profile(inventory):
+    """Per inventory agency: facility count, median year built and age, assessment coverage
+
+    Each agency is profiled from its latest inventory year only, since every year lists the
+    same facilities again.
+    """
+    latest = inventory.groupby('Agency Name', observed=True)['Inventory Year'].transform('max')
+    inventory = inventory[inventory['Inventory Year'] == latest]
+    profile = inventory.groupby('Agency Name', observed=True).agg(
+        facilities=('Agency Name', 'size'),
+        median_year_built=('Year Built', 'median'),
+        inventory_year=('Inventory Year', 'max'),
+        assessed_share=('Condition Assessment Date', lambda d: d.notna().mean()),
+        latest_assessment=('Condition Assessment Date', 'max'),
+    )
+    profile['median_age'] = profile['inventory_year'] - profile['median_year_built']
+    return profile
+
+def event_rollup(events):
+    """Per event agency: incidents, fatalities and injuries"""
+    return events.groupby('agency').agg(
+        incidents=('agency', 'size'),
+        fatalities=('total_fatalities', 'sum'),
+        injuries=('total_injuries', 'sum'),
+    )
+
+def join_events_to_facilities(events, inventory, crosswalk):
+    """Event rollups per agency with the matched agency's facility age and condition attached"""
+    rollup = event_rollup(events).join(
+        crosswalk.set_index('event_agency')[['inventory_agency', 'method']])
+    return rollup.join(facility_profile(inventory), on='inventory_agency')
+
+def main(argv=None):
+    """Build/update the crosswalk and print event rollups with facility profiles"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('years', nargs='*', type=int, help='inventory years (default: all known)')
+    parser.add_argument('--store', default=None, help='read events from this SQLite event store')
+    parser.add_argument('--crosswalk', default=DEFAULT_CROSSWALK, help='crosswalk CSV path')
+    parser.add_argument('--refresh', action='store_true', help='rematch every agency')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    from facility_inventory import load_inventories
+    from fta_safety_analysis import load_fta_data
+    inventory = load_inventories(args.years)
+    if args.store:
+        from fta_event_store import load_events
+        events = load_events(args.store, load_fta_data,
+                             columns=['agency', 'total_fatalities', 'total_injuries'])
+    else:
+        events = load_fta_data()
+    if events is None:
+        logging.error("Cannot proceed without data")
+        return
+
+    crosswalk = update_crosswalk(events['agency'], inventory['Agency Name'], args.crosswalk,
+                                 args.refresh)
+    joined = join_events_to_facilities(events, inventory, crosswalk)
+    print(joined.sort_values('fatalities', ascending=False).head(25).to_string())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Bayesian Linear Regression Sweep
+Fits the Exercise 3.4 curve over a grid of EM initializations (alpha, beta), polynomial basis
+sets and noise levels across a process pool, recording log-evidence, EM iterations and runtime
+per configuration
+
+Example:
+    python bayes_linreg_sweep.py --degrees 0,1,2,3,5 0,1,2,3 0,1,2,3,4,5,6 --noise 0.01 0.05 0.2
+    python bayes_linreg_sweep.py --alphas 0.01 1 100 --betas 0.1 1 10 --output sweep.csv
+"""
+
+import argparse
+import itertools
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from bayes_linreg import BayesianLinearRegression, polynomial_basis
+
+# True signal from the exercise: .2 - x + .9x^2 + .7x^3 - .2x^5 on [0, 2)
+TRUE_DEGREES = (0, 1, 2, 3, 5)
+TRUE_THETA = (.2, -1, .9, .7, -.2)
+INTERVAL = (0, 2)
+
+DEFAULT_OUTPUT = 'bayes_linreg_sweep.csv'
+
+def simulate(n_samples, noise_var, seed):
+    """Equally spaced samples of the true curve plus Gaussian noise of variance noise_var"""
+    a, b = INTERVAL
+    x = np.arange(a, b, (b - a) / n_samples)
+    rng = np.random.default_rng(seed)
+    y = polynomial_basis(x, TRUE_DEGREES) @ np.asarray(TRUE_THETA)
+    return x, y + np.sqrt(noise_var) * rng.normal(0, 1, n_samples)
+
+def run_group(degrees, noise_var, seed, inits, n_samples, max_iter, tol):
+    """Fit one dataset/basis pair from every (alpha, beta) initialization"""
+    x, y = simulate(n_samples, noise_var, seed)
+    Phi = polynomial_basis(x, degrees)
+
+    rows = []
+    for alpha0, beta0 in inits:
+        start = time.perf_counter()
+        model = BayesianLinearRegression(alpha0, beta0, max_iter, tol).fit(Phi, y)
+        runtime = time.perf_counter() - start
+        rows.append({
+            'degrees': ','.join(map(str, degrees)), 'noise_var': noise_var, 'seed': seed,
+            'alpha_init': alpha0, 'beta_init': beta0,
+            'log_evidence': float(model.log_evidence_), 'n_iter': int(model.n_iter_),
+            'converged': bool(model.converged_), 'runtime_s': runtime,
+            'alpha': float(model.alpha_), 'noise_var_est': float(model.noise_var_),
+        })
+    return rows
+
+def run_sweep(degree_sets, noise_levels, alphas, betas, seeds=(0,), n_samples=500,
+              max_iter=500, tol=1e-8, workers=None):
+    """Results table with one row per (basis, noise level, seed, alpha init, beta init)"""
+    import pandas as pd
+
+    inits = list(itertools.product(alphas, betas))
+    groups = list(itertools.product(degree_sets, noise_levels, seeds))
+    args = [(tuple(d), nv, s, inits, n_samples, max_iter, tol) for d, nv, s in groups]
+
+    if workers == 1 or len(groups) <= 1:
+        results = [run_group(*a) for a in args]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(run_group, *zip(*args)))
+
+    table = pd.DataFrame([row for rows in results for row in rows])
+    logging.info(f"Swept {len(table)} configurations ({len(groups)} datasets x {len(inits)} inits), "
+                 f"{(~table['converged']).sum()} did not converge")
+    return table
+
+def save_table(table, path):
+    """Write the results as CSV, or Parquet if the path ends in .parquet"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    if path.endswith('.parquet'):
+        table.to_parquet(path, index=False)
+    else:
+        table.to_csv(path, index=False)
+    logging.info(f"Sweep results saved to {path}")
+
+def main(argv=None):
+    """Sweep EM initializations, basis sets and noise levels and save a results table"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--degrees', nargs='+', default=['0,1,2,3,5', '0,1,2,3', '0,1,2,3,4,5,6'],
+                        help='basis sets as comma-separated polynomial degrees')
+    parser.add_argument('--noise', nargs='+', type=float, default=[0.01, 0.05, 0.2],
+                        help='noise variances')
+    parser.add_argument('--alphas', nargs='+', type=float, default=[0.01, 1, 100],
+                        help='initial prior precisions')
+    parser.add_argument('--betas', nargs='+', type=float, default=[0.1, 1, 10],
+                        help='initial noise precisions')
+    parser.add_argument('--seeds', nargs='+', type=int, default=[0], help='noise seeds')
+    parser.add_argument('-n', '--n-samples', type=int, default=500, help='training samples')
+    parser.add_argument('--max-iter', type=int, default=500)
+    parser.add_argument('--tol', type=float, default=1e-8, help='relative change in alpha/beta')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='.csv or .parquet results table')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    degree_sets = [tuple(int(d) for d in spec.split(',')) for spec in args.degrees]
+    table = run_sweep(degree_sets, args.noise, args.alphas, args.betas, args.seeds,
+                      args.n_samples, args.max_iter, args.tol, args.workers)
+    save_table(table, args.output)
+
+    best = table.loc[table.groupby(['noise_var', 'seed'])['log_evidence'].idxmax()]
+    print(best[['noise_var', 'seed', 'degrees', 'log_evidence', 'n_iter', 'noise_var_est']]
+          .to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Cluster Evaluation
+Scores for choosing k without paying the quadratic cost of a full silhouette on every sweep step:
+
+  * silhouette_exact       Euclidean silhouette over all pairs, blockwise (small data only)
+  * silhouette_sampled     stratified-by-cluster sample of points scored against all points,
+                           with a confidence interval, O(sample x N)
+  * silhouette_sq_euclidean  squared-Euclidean silhouette (Spark ClusteringEvaluator's default),
+                           exact in O(N k d) from per-cluster sums
+  * simplified_silhouette, davies_bouldin, inertia
+                           centroid-based proxies from the per-cluster sufficient statistics
+                           (size, sum of rows, sum of squared norms)
+
+Works on dense arrays and SciPy sparse matrices.
+"""
+
+import logging
+from collections import namedtuple
+from statistics import NormalDist
+
+import numpy as np
+import scipy.sparse as sp
+
+# Distance-matrix entries held at once by the pairwise silhouettes
+BLOCK_CELLS = 10_000_000
+
+ClusterStats = namedtuple('ClusterStats', ['sizes', 'sums', 'sq_sums'])
+
+def row_sq_norms(X):
+    """Squared L2 norm of each row of a sparse or dense matrix"""
+    if sp.issparse(X):
+        return np.asarray(X.multiply(X).sum(axis=1)).ravel()
+    return np.einsum('ij,ij->i', X, X)
+
+def _dense(M):
+    return np.asarray(M.todense()) if sp.issparse(M) else np.asarray(M)
+
+def cluster_stats(X, labels, k=None, x_sq=None):
+    """Per-cluster size, row sum and sum of squared norms (one pass over X)"""
+    labels = np.asarray(labels)
+    k = int(labels.max()) + 1 if k is None else k
+    x_sq = row_sq_norms(X) if x_sq is None else x_sq
+    onehot = sp.csr_matrix((np.ones(len(labels)), (labels, np.arange(len(labels)))),
+                           shape=(k, len(labels)))
+    return ClusterStats(np.bincount(labels, minlength=k).astype(float), _dense(onehot @ X),
+                        np.bincount(labels, weights=x_sq, minlength=k))
+
+def _centroids(stats):
+    return stats.sums / np.maximum(stats.sizes, 1)[:, None]
+
+def inertia(stats):
+    """Within-cluster sum of squared distances to the centroids"""
+    return float(np.sum(stats.sq_sums - np.einsum('ij,ij->i', stats.sums, stats.sums)
+                        / np.maximum(stats.sizes, 1)))
+
+def davies_bouldin(stats):
+    """Davies-Bouldin index from cluster statistics (lower is better), O(k^2 d)
+
+    Scatter is the RMS distance to the centroid, sqrt(sq_sum/n - |mu|^2).
+    """
+    present = stats.sizes > 0
+    sizes, mu = stats.sizes[present], _centroids(stats)[present]
+    if len(sizes) < 2:
+        return 0.0
+    scatter = np.sqrt(np.maximum(stats.sq_sums[present] / sizes - np.einsum('ij,ij->i', mu, mu), 0))
+    mu_sq = np.einsum('ij,ij->i', mu, mu)
+    separation = np.sqrt(np.maximum(mu_sq[:, None] - 2 * mu @ mu.T + mu_sq[None, :], 0))
+    np.fill_diagonal(separation, np.inf)
+    ratios = (scatter[:, None] + scatter[None, :]) / np.where(separation > 0, separation, 1e-12)
+    np.fill_diagonal(ratios, -np.inf)
+    return float(ratios.max(axis=1).mean())
+
+def _silhouette_values(a, b):
+    """(b - a) / max(a, b), 0 where both are 0"""
+    denom = np.maximum(a, b)
+    return np.divide(b - a, denom, out=np.zeros_like(a), where=denom > 0)
+
+def simplified_silhouette(X, labels, centers=None, x_sq=None, stats=None):
+    """Silhouette with distances to centroids instead of to every point, O(N k d)"""
+    labels = np.asarray(labels)
+    x_sq = row_sq_norms(X) if x_sq is None else x_sq
+    if centers is None:
+        centers = _centroids(stats if stats is not None else cluster_stats(X, labels, x_sq=x_sq))
+    centers = np.asarray(centers)
+    if len(centers) < 2:
+        return 0.0
+    d = np.sqrt(np.maximum(x_sq[:, None] - 2 * _dense(X @ centers.T)
+                           + np.einsum('ij,ij->i', centers, centers), 0))
+    own = np.arange(len(labels)), labels
+    a = d[own].copy()
+    d[own] = np.inf
+    return float(_silhouette_values(a, d.min(axis=1)).mean())
+
+def silhouette_sq_euclidean(X, labels, x_sq=None, stats=None):
+    """Mean squared-Euclidean silhouette (Spark ClusteringEvaluator default), exact in O(N k d)
+
+    The mean squared distance from x to the points of cluster c is
+    |x|^2 - 2 x.sum_c / n_c + sq_sum_c / n_c, so only per-cluster sums are needed.
+    """
+    labels = np.asarray(labels)
+    x_sq = row_sq_norms(X) if x_sq is None else x_sq
+    stats = cluster_stats(X, labels, x_sq=x_sq) if stats is None else stats
+    present = np.flatnonzero(stats.sizes > 0)
+    if len(present) < 2:
+        return 0.0
+    sizes = stats.sizes[present]
+
+    mean_sq_dist = (x_sq[:, None] - 2 * _dense(X @ stats.sums[present].T) / sizes
+                    + stats.sq_sums[present] / sizes)                    # (n, clusters)
+    position = np.searchsorted(present, labels)
+    own = np.arange(len(labels)), position
+    own_size = sizes[position]
+    a = mean_sq_dist[own] * own_size / np.maximum(own_size - 1, 1)    # exclude the point itself
+    mean_sq_dist[own] = np.inf
+    s = _silhouette_values(a, mean_sq_dist.min(axis=1))
+    s[own_size == 1] = 0
+    return float(s.mean())
+
+def _point_silhouettes(X, labels, rows, x_sq, sizes):
+    """Euclidean silhouette of the given rows against every point, in bounded blocks"""
+    n, k = X.shape[0], len(sizes)
+    onehot = sp.csr_matrix((np.ones(n), (np.arange(n), labels)), shape=(n, k))
+    block = max(1, BLOCK_CELLS // max(n, 1))
+    values = np.empty(len(rows))
+    for start in range(0, len(rows), block):
+        idx = rows[start:start + block]
+        # sparse x dense product; sparse x sparse.T would build a huge sparse result first
+        dots = np.asarray(X @ _dense(X[idx]).T).T
+        d = np.sqrt(np.maximum(x_sq[idx, None] - 2 * dots + x_sq[None, :], 0))
+        totals = np.asarray(onehot.T @ d.T).T                               # (block, k) sums
+        own = np.arange(len(idx)), labels[idx]
+        own_size = sizes[labels[idx]]
+        a = totals[own] / np.maximum(own_size - 1, 1)
+        means = totals / np.where(sizes > 0, sizes, np.nan)
+        means[own] = np.nan
+        b = np.where(np.isnan(means), np.inf, means).min(axis=1)
+        s = _silhouette_values(a, b)
+        s[own_size == 1] = 0
+        values[start:start + len(idx)] = s
+    return values
+
+def silhouette_exact(X, labels, x_sq=None):
+    """Mean Euclidean silhouette over all pairs; O(N^2), meant for small data"""
+    labels = np.asarray(labels)
+    sizes = np.bincount(labels).astype(float)
+    if np.count_nonzero(sizes) < 2:
+        return 0.0
+    x_sq = row_sq_norms(X) if x_sq is None else x_sq
+    return float(_point_silhouettes(X, labels, np.arange(len(labels)), x_sq, sizes).mean())
+
+def silhouette_sampled(X, labels, n_samples=1000, level=0.95, seed=0, x_sq=None):
+    """Stratified-sample estimate of the Euclidean silhouette with a confidence interval
+
+    Points are sampled per cluster in proportion to its size (at least 2 each) and scored
+    against all points. Returns (estimate, lower, upper); exact when the sample covers N.
+    """
+    labels = np.asarray(labels)
+    n = len(labels)
+    sizes = np.bincount(labels).astype(float)
+    if np.count_nonzero(sizes) < 2:
+        return 0.0, 0.0, 0.0
+    if n_samples >= n:
+        value = silhouette_exact(X, labels, x_sq)
+        return value, value, value
+
+    x_sq = row_sq_norms(X) if x_sq is None else x_sq
+    rng = np.random.default_rng(seed)
+    clusters = np.flatnonzero(sizes)
+    take = np.minimum(sizes[clusters], np.maximum(2, np.round(n_samples * sizes[clusters] / n))).astype(int)
+
+    order = np.argsort(labels, kind='stable')
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(int)
+    rows = np.concatenate([rng.choice(order[starts[c]:starts[c] + int(sizes[c])], t, replace=False)
+                           for c, t in zip(clusters, take)])
+    values = _point_silhouettes(X, labels, rows, x_sq, sizes)
+
+    # Stratified mean and variance (with finite-population correction)
+    strata = np.repeat(np.arange(len(clusters)), take)
+    weights = sizes[clusters] / n
+    means = np.bincount(strata, weights=values) / take
+    sq_dev = np.bincount(strata, weights=(values - means[strata])**2)
+    var_within = sq_dev / np.maximum(take - 1, 1)
+    estimate = float(weights @ means)
+    se = float(np.sqrt(np.sum(weights**2 * var_within / take * (1 - take / sizes[clusters]))))
+    half_width = NormalDist().inv_cdf(0.5 + level / 2) * se
+    logging.debug(f"Sampled silhouette from {len(rows)} of {n} points: {estimate:.4f} +/- {half_width:.4f}")
+    return estimate, float(estimate - half_width), float(estimate + half_width)
+
+def evaluate(X, labels, k=None, centers=None, silhouette='sq_euclidean', x_sq=None, **sample_options):
+    """Silhouette (exact, sampled or squared-Euclidean) plus centroid proxies as a dict"""
+    labels = np.asarray(labels)
+    x_sq = row_sq_norms(X) if x_sq is None else x_sq
+    stats = cluster_stats(X, labels, k, x_sq)
+    scores = {'inertia': inertia(stats), 'davies_bouldin': davies_bouldin(stats),
+              'simplified_sil': simplified_silhouette(X, labels, centers, x_sq, stats)}
+
+    if silhouette == 'sq_euclidean':
+        scores['sil_score'] = silhouette_sq_euclidean(X, labels, x_sq, stats)
+    elif silhouette == 'exact':
+        scores['sil_score'] = silhouette_exact(X, labels, x_sq)
+    elif silhouette == 'sampled':
+        scores['sil_score'], scores['sil_lower'], scores['sil_upper'] = silhouette_sampled(
+            X, labels, x_sq=x_sq, **sample_options)
+    elif silhouette is not None:
+        raise ValueError(f"Unknown silhouette {silhouette!r}: use 'sq_euclidean', 'exact' or 'sampled'")
+    return scores
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+FTA Facility Inventory Ingestion
+Streams the Facility Inventory workbook once (read-only, selected columns only) into a cached
+Arrow/Feather file, which later runs open memory-mapped instead of re-parsing the Excel file
+
+Example:
+    python facility_inventory.py 2019
+"""
+
+import argparse
+import io
+import logging
+import os
+import urllib.request
+
+# Published inventory workbooks by year; add new years here
+INVENTORY_URLS = {
+    2019: 'https://www.transit.dot.gov/sites/fta.dot.gov/files/2020-10/2019%20Facility%20Inventory.xlsx',
+}
+
+# Shared schema for every inventory year (column -> pandas dtype)
+INVENTORY_SCHEMA = {
+    'Agency Name': 'string',
+    'Year Built': 'Int16',
+    'Condition Assessment Date': 'datetime64[ns]',
+    'Notes': 'string',
+}
+
+DEFAULT_CACHE_DIR = '.facility_cache'
+CHUNK_ROWS = 5000
+# Plausible 'Year Built' values; anything outside is a data-entry error and becomes NA
+YEAR_BUILT_RANGE = (1800, 2100)
+
+def _open_workbook_source(source):
+    """Local path as-is; URLs are downloaded into memory (openpyxl needs a seekable file)"""
+    if source.startswith(('http://', 'https://')):
+        logging.info(f"Downloading {source}...")
+        with urllib.request.urlopen(source) as response:
+            return io.BytesIO(response.read())
+    return source
+
+def stream_workbook(source, columns=tuple(INVENTORY_SCHEMA)):
+    """Yield rows (tuples in `columns` order) from the first sheet without loading the workbook"""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(_open_workbook_source(source), read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+
+        # The header is the first row naming all the wanted columns (title rows may precede it)
+        for header in rows:
+            names = [str(v).strip() if v is not None else '' for v in header]
+            if all(c in names for c in columns):
+                break
+        else:
+            raise ValueError(f"No header row with columns {list(columns)} in {source}")
+
+        positions = [names.index(c) for c in columns]
+        for row in rows:
+            values = tuple(row[i] if i < len(row) else None for i in positions)
+            if any(v is not None for v in values):
+                yield values
+    finally:
+        wb.close()
+
+def apply_schema(df):
+    """Coerce an inventory frame to INVENTORY_SCHEMA so years concatenate cleanly"""
+    import pandas as pd
+
+    df = df.copy()
+    for col, dtype in INVENTORY_SCHEMA.items():
+        if col not in df.columns:
+            df[col] = None
+        if dtype.startswith('datetime'):
+            df[col] = pd.to_datetime(df[col], errors='coerce').astype(dtype)
+        elif dtype == 'Int16':
+            years = pd.to_numeric(df[col], errors='coerce').round()
+            df[col] = years.where(years.between(*YEAR_BUILT_RANGE)).astype(dtype)
+        else:
+            df[col] = df[col].astype(dtype)
+    return df
+
+def read_workbook(source):
+    """Parse the selected columns from a workbook in chunks into a typed DataFrame"""
+    import pandas as pd
+
+    columns = list(INVENTORY_SCHEMA)
+    chunks, chunk = [], []
+    for row in stream_workbook(source, columns):
+        chunk.append(row)
+        if len(chunk) >= CHUNK_ROWS:
+            chunks.append(apply_schema(pd.DataFrame(chunk, columns=columns)))
+            chunk = []
+    chunks.append(apply_schema(pd.DataFrame(chunk, columns=columns)))
+
+    df = pd.concat(chunks, ignore_index=True)
+    logging.info(f"Parsed {len(df)} facilities from {source}")
+    return df
+
+def cache_path(year, cache_dir=DEFAULT_CACHE_DIR):
+    """Columnar cache file for one inventory year"""
+    return os.path.join(cache_dir, f"facility_inventory_{year}.feather")
+
+def load_inventory(year, source=None, cache_dir=DEFAULT_CACHE_DIR, refresh=False):
+    """Load one inventory year, converting the workbook to the columnar cache on first use"""
+    import pyarrow.feather as feather
+
+    path = cache_path(year, cache_dir)
+    if refresh or not os.path.exists(path):
+        source = source or INVENTORY_URLS[year]
+        df = read_workbook(source)
+        df.insert(0, 'Inventory Year', year)
+        df['Inventory Year'] = df['Inventory Year'].astype('int16')
+
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = path + '.tmp'
+        df.to_feather(tmp_path, compression='uncompressed')  # uncompressed so it can be mapped
+        os.replace(tmp_path, path)
+        logging.info(f"Cached inventory {year} to {path}")
+
+    table = feather.read_table(path, memory_map=True)
+    return apply_schema(table.to_pandas())
+
+def load_inventories(years=None, cache_dir=DEFAULT_CACHE_DIR, refresh=False):
+    """Load and concatenate several inventory years with the shared schema"""
+    import pandas as pd
+
+    years = sorted(years or INVENTORY_URLS)
+    frames = [load_inventory(year, cache_dir=cache_dir, refresh=refresh) for year in years]
+    df = pd.concat(frames, ignore_index=True)
+    logging.info(f"Loaded {len(df)} facilities from inventory years {years}")
+    return df
+
+def main(argv=None):
+    """Convert inventory workbooks to the columnar cache"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('years', nargs='*', type=int, help='inventory years (default: all known)')
+    parser.add_argument('--source', default=None, help='local workbook path (single year only)')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--refresh', action='store_true', help='re-read the workbook')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    if args.source:
+        if len(args.years) != 1:
+            parser.error('--source needs exactly one year')
+        df = load_inventory(args.years[0], args.source, args.cache_dir, args.refresh)
+    else:
+        df = load_inventories(args.years, args.cache_dir, args.refresh)
+    print(df.dtypes)
+    print(f"\n{len(df)} facilities")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Facility Notes Similarity Index
+Sparse (SciPy CSR) TF-IDF index over tokenized Facility Inventory Notes with batched
+cosine-similarity top-k queries and incremental updates when a new inventory year is added
+
+Example:
+    python facility_note_index.py 2019 --query "roof replaced" "assessment pending"
+    python facility_note_index.py --benchmark
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+
+import numpy as np
+import scipy.sparse as sp
+
+DEFAULT_INDEX_DIR = os.path.join('.facility_cache', 'note_index')
+
+# Upper bound on query-batch x documents similarity entries held at once
+MAX_BATCH_CELLS = 20_000_000
+
+class NoteIndex:
+    """TF-IDF index: raw term counts are kept so adding documents never rebuilds old rows"""
+
+    def __init__(self):
+        self.vocabulary = {}
+        self.doc_ids = []
+        self.counts = sp.csr_matrix((0, 0), dtype=np.float32)
+        self.doc_freq = np.zeros(0, dtype=np.int64)
+        self._weights = None
+        self._weights_t = None
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def _count_matrix(self, token_lists, grow_vocabulary):
+        """CSR term counts for token lists, optionally adding unseen terms to the vocabulary"""
+        import pandas as pd
+
+        lengths = np.fromiter((len(t) for t in token_lists), dtype=np.int64, count=len(token_lists))
+        flat = [token for tokens in token_lists for token in tokens]
+        codes, uniques = pd.factorize(pd.Series(flat, dtype=object))
+
+        # Map the (few) unique tokens to vocabulary columns; unknown ones get -1 unless growing
+        columns = np.empty(len(uniques), dtype=np.int64)
+        for i, token in enumerate(uniques):
+            column = self.vocabulary.get(token)
+            if column is None and grow_vocabulary:
+                column = self.vocabulary[token] = len(self.vocabulary)
+            columns[i] = -1 if column is None else column
+
+        cols = columns[codes] if len(flat) else np.zeros(0, dtype=np.int64)
+        rows = np.repeat(np.arange(len(token_lists)), lengths)
+        known = cols >= 0
+        matrix = sp.csr_matrix((np.ones(known.sum(), dtype=np.float32), (rows[known], cols[known])),
+                               shape=(len(token_lists), len(self.vocabulary)))
+        matrix.sum_duplicates()
+        return matrix
+
+    def add(self, token_lists, doc_ids=None):
+        """Append documents (lists of tokens); only the new rows are counted"""
+        token_lists = list(token_lists)
+        doc_ids = list(doc_ids) if doc_ids is not None else list(
+            range(len(self.doc_ids), len(self.doc_ids) + len(token_lists)))
+
+        new_counts = self._count_matrix(token_lists, grow_vocabulary=True)
+        n_terms = len(self.vocabulary)
+        old_counts = self.counts
+        old_counts.resize((old_counts.shape[0], n_terms))
+
+        self.counts = sp.vstack([old_counts, new_counts], format='csr')
+        self.doc_freq = np.concatenate([self.doc_freq, np.zeros(n_terms - len(self.doc_freq), dtype=np.int64)])
+        self.doc_freq += np.bincount(new_counts.indices, minlength=n_terms)
+        self.doc_ids.extend(doc_ids)
+        self._weights = self._weights_t = None
+        logging.info(f"Indexed {len(token_lists)} notes ({len(self)} total, {n_terms} terms)")
+
+    @property
+    def idf(self):
+        """Smoothed inverse document frequency"""
+        return np.log((1 + len(self)) / (1 + self.doc_freq)).astype(np.float32) + 1
+
+    def _normalize(self, counts):
+        """TF-IDF weight and L2-normalize rows"""
+        weighted = sp.csr_matrix(counts.multiply(self.idf[:counts.shape[1]]))
+        norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        return sp.csr_matrix(sp.diags(1 / norms) @ weighted, dtype=np.float32)
+
+    @property
+    def weights(self):
+        """Document TF-IDF matrix, recomputed only after documents are added"""
+        if self._weights is None:
+            self._weights = self._normalize(self.counts)
+        return self._weights
+
+    @property
+    def weights_t(self):
+        """Term x document transpose of weights used by queries, cached alongside it"""
+        if self._weights_t is None:
+            self._weights_t = self.weights.T.tocsr()
+        return self._weights_t
+
+    def query(self, token_lists, k=10):
+        """Top-k (doc_id, cosine similarity) lists for each query token list"""
+        queries = self._normalize(self._count_matrix(list(token_lists), grow_vocabulary=False))
+        doc_weights_t = self.weights_t
+        batch_size = max(1, MAX_BATCH_CELLS // max(len(self), 1))
+
+        results = []
+        for start in range(0, queries.shape[0], batch_size):
+            scores = (queries[start:start + batch_size] @ doc_weights_t).tocsr()
+            for row in range(scores.shape[0]):
+                lo, hi = scores.indptr[row], scores.indptr[row + 1]
+                data, docs = scores.data[lo:hi], scores.indices[lo:hi]
+                top = np.argpartition(-data, k - 1)[:k] if len(data) > k else np.arange(len(data))
+                top = top[np.argsort(-data[top])]
+                results.append([(self.doc_ids[docs[i]], float(data[i])) for i in top])
+        return results
+
+    @property
+    def nbytes(self):
+        """Memory held by the sparse count and weight matrices"""
+        total = 0
+        for matrix in (self.counts, self._weights, self._weights_t):
+            if matrix is not None:
+                total += matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+        return total + self.doc_freq.nbytes
+
+    def save(self, index_dir=DEFAULT_INDEX_DIR):
+        """Persist counts, vocabulary and document ids so later years can be added incrementally"""
+        os.makedirs(index_dir, exist_ok=True)
+        sp.save_npz(os.path.join(index_dir, 'counts.npz'), self.counts)
+        with open(os.path.join(index_dir, 'index.json'), 'w') as f:
+            json.dump({'vocabulary': self.vocabulary, 'doc_ids': self.doc_ids}, f, default=str)
+
+    @classmethod
+    def load(cls, index_dir=DEFAULT_INDEX_DIR):
+        """Load a saved index"""
+        index = cls()
+        index.counts = sp.load_npz(os.path.join(index_dir, 'counts.npz')).tocsr()
+        with open(os.path.join(index_dir, 'index.json')) as f:
+            meta = json.load(f)
+        # JSON turns tuple ids such as (inventory year, row) into lists; restore them
+        index.vocabulary = meta['vocabulary']
+        index.doc_ids = [tuple(d) if isinstance(d, list) else d for d in meta['doc_ids']]
+        index.doc_freq = np.bincount(index.counts.indices, minlength=len(index.vocabulary))
+        return index
+
+def index_inventory_year(index, df, year):
+    """Add one inventory year's notes, ids are (inventory year, row)"""
+    from facility_note_tokens import tokenize_notes
+
+    notes = df.loc[df['Inventory Year'] == year, 'Notes'].dropna()
+    tokens = tokenize_notes(notes)
+    index.add(tokens.tolist(), [(int(year), int(i)) for i in notes.index])
+
+def benchmark_index(sizes=(10_000, 100_000, 1_000_000), n_queries=100, k=10, seed=0):
+    """Build time, memory and per-query latency on synthetic Zipf-distributed notes"""
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array([f"term{i}" for i in range(20_000)], dtype=object)
+    results = []
+    for size in sizes:
+        lengths = rng.integers(3, 15, size)
+        terms = np.minimum(rng.zipf(1.3, lengths.sum()), len(vocabulary)) - 1
+        docs = np.split(vocabulary[terms], np.cumsum(lengths)[:-1])
+
+        index = NoteIndex()
+        start = time.perf_counter()
+        index.add([d.tolist() for d in docs])
+        index.weights_t
+        build_s = time.perf_counter() - start
+
+        queries = [docs[i].tolist() for i in rng.integers(0, size, n_queries)]
+        start = time.perf_counter()
+        index.query(queries, k)
+        query_s = time.perf_counter() - start
+
+        results.append({'notes': size, 'terms': len(index.vocabulary), 'build_s': build_s,
+                        'index_mb': index.nbytes / 1024**2,
+                        'query_ms': 1000 * query_s / n_queries})
+    return pd.DataFrame(results)
+
+def main(argv=None):
+    """Build or update the notes index and run similarity queries"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('years', nargs='*', type=int, help='inventory years to add to the index')
+    parser.add_argument('--index-dir', default=DEFAULT_INDEX_DIR)
+    parser.add_argument('--query', nargs='+', default=[], help='free-text queries')
+    parser.add_argument('-k', type=int, default=10, help='results per query')
+    parser.add_argument('--benchmark', action='store_true', help='report latency/memory at 10k-1M notes')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    if args.benchmark:
+        print(benchmark_index().to_string(index=False))
+        return
+
+    from facility_inventory import load_inventories
+    from facility_note_tokens import tokenize_notes
+    import pandas as pd
+
+    index = NoteIndex.load(args.index_dir) if os.path.exists(args.index_dir) else NoteIndex()
+    indexed_years = {doc_id[0] for doc_id in index.doc_ids}
+    new_years = [y for y in args.years if y not in indexed_years]
+    if new_years:
+        df = load_inventories(new_years)
+        for year in new_years:
+            index_inventory_year(index, df, year)
+        index.save(args.index_dir)
+
+    if args.query:
+        start = time.perf_counter()
+        hits = index.query(tokenize_notes(pd.Series(args.query), cache_path=None, workers=1), args.k)
+        logging.info(f"{len(args.query)} queries in {1000 * (time.perf_counter() - start):.1f} ms, "
+                     f"index {index.nbytes / 1024**2:.1f} MB")
+        for query, results in zip(args.query, hits):
+            print(f"\n{query}:")
+            for (year, row), score in results:
+                print(f"  {score:.3f}  {year} row {row}")
+
+if __name__ == "__main__":
+    main()
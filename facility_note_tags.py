@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Facility Notes Tagger
+Compiles a table of labelled patterns into one regular expression (one named group per label)
+and tags every note in a single vectorized pass, producing a sparse note x label matrix
+
+Example:
+    python facility_note_tags.py 2019
+    python facility_note_tags.py 2019 --rules my_rules.csv
+"""
+
+import argparse
+import logging
+import re
+
+import numpy as np
+import scipy.sparse as sp
+
+# (label, pattern) table; several rows may share a label. Patterns are case-insensitive.
+# \b keeps e.g. 'replac' from matching inside 'irreplaceable'.
+DEFAULT_RULES = [
+    ('renovation', r'\brenovat\w*'),
+    ('renovation', r'\brehab\w*'),
+    ('renovation', r'\bremodel\w*'),
+    ('renovation', r'\bupgrad\w*'),
+    ('replacement', r'\breplac\w*'),
+    ('replacement', r'\bre-?roof\w*'),
+    ('replacement', r'\bnew (?:roof|hvac|boiler|building)'),
+    ('assessment', r'\b(?:condition )?assess\w*'),
+    ('assessment', r'\binspect\w*'),
+    ('disposal', r'\bdispos\w*'),
+    ('disposal', r'\b(?:demolish\w*|demolition)'),
+    ('disposal', r'\b(?:to be |was )?sold\b'),
+    ('year_mention', r'(?<!\d)(?:1[89]|20)\d{2}(?!\d)'),
+]
+
+def load_rules(path):
+    """Read a rules table (CSV with `label` and `pattern` columns)"""
+    import pandas as pd
+
+    rules = pd.read_csv(path, dtype=str).dropna(subset=['label', 'pattern'])
+    return list(rules[['label', 'pattern']].itertuples(index=False, name=None))
+
+def compile_rules(rules):
+    """One pattern with a named group per label; adding rules never adds another scan
+
+    Matches don't overlap, so text matched by one label isn't also counted for a later one.
+    """
+    labels, alternatives = [], {}
+    for label, pattern in rules:
+        if not re.fullmatch(r'[A-Za-z_]\w*', label):
+            raise ValueError(f"Label {label!r} must be a valid identifier")
+        try:
+            re.compile(pattern)
+        except re.error as e:
+            raise ValueError(f"Bad pattern for {label!r}: {pattern!r} ({e})")
+        if label not in alternatives:
+            labels.append(label)
+            alternatives[label] = []
+        alternatives[label].append(pattern)
+
+    combined = '|'.join(f"(?P<{label}>{'|'.join(f'(?:{p})' for p in alternatives[label])})"
+                        for label in labels)
+    return re.compile(combined, re.IGNORECASE), labels
+
+def tag_notes(notes, rules=DEFAULT_RULES):
+    """Sparse (notes x labels) match-count matrix and its label names, rows in `notes` order"""
+    pattern, labels = compile_rules(rules)
+
+    matches = notes.dropna().astype(str).str.extractall(pattern)
+    positions = notes.index.get_indexer(matches.index.get_level_values(0))
+
+    # Each match fills exactly one label's group
+    hit_rows, hit_labels = np.nonzero(matches[labels].notna().to_numpy())
+    matrix = sp.csr_matrix(
+        (np.ones(len(hit_rows), dtype=np.int32), (positions[hit_rows], hit_labels)),
+        shape=(len(notes), len(labels)))
+    matrix.sum_duplicates()
+
+    logging.info(f"Tagged {len(notes)} notes: {matrix.getnnz()} (note, label) hits, "
+                 f"{int((matrix.getnnz(axis=1) > 0).sum())} notes with at least one tag")
+    return matrix, labels
+
+def tags_frame(matrix, labels, index):
+    """Sparse-backed DataFrame of tag counts, joinable to the inventory on its index"""
+    import pandas as pd
+
+    return pd.DataFrame.sparse.from_spmatrix(matrix, index=index, columns=labels)
+
+def tags_by_agency(df, matrix, labels, agency_col='Agency Name'):
+    """Notes per agency carrying each tag, via a sparse agency x notes indicator product"""
+    import pandas as pd
+
+    codes, agencies = pd.factorize(df[agency_col])
+    valid = codes >= 0
+    membership = sp.csr_matrix(
+        (np.ones(valid.sum(), dtype=np.int32), (codes[valid], np.flatnonzero(valid))),
+        shape=(len(agencies), len(df)))
+
+    has_tag = (matrix > 0).astype(np.int32)
+    counts = (membership @ has_tag).toarray()
+    return pd.DataFrame(counts, index=pd.Index(agencies, name=agency_col), columns=labels)
+
+def main(argv=None):
+    """Tag inventory notes and summarize tags per agency"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('years', nargs='*', type=int, help='inventory years (default: all known)')
+    parser.add_argument('--rules', default=None, help='CSV rules table with label,pattern columns')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    from facility_inventory import load_inventories
+    df = load_inventories(args.years)
+    rules = load_rules(args.rules) if args.rules else DEFAULT_RULES
+
+    matrix, labels = tag_notes(df['Notes'], rules)
+    by_agency = tags_by_agency(df, matrix, labels)
+    print(by_agency.sort_values(labels[0], ascending=False).head(20).to_string())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Facility Notes Tokenization
+Normalizes, tokenizes, removes stopwords and builds n-grams for the Facility Inventory Notes.
+Identical notes are processed once, batches run across a process pool, and tokens are cached
+by note hash so unchanged notes are never re-tokenized
+
+Example:
+    python facility_note_tokens.py 2019 --workers 4
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULT_CACHE = os.path.join('.facility_cache', 'note_tokens.sqlite')
+BATCH_SIZE = 500
+
+# Words and four-digit years; hyphenated/apostrophe words stay whole ("re-roofed", "agency's")
+TOKEN_PATTERN = r"[a-z]+(?:['-][a-z]+)*|\d{4}"
+
+# Used only if the nltk stopwords corpus hasn't been downloaded
+FALLBACK_STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'been', 'but', 'by', 'for', 'from', 'has',
+    'have', 'in', 'is', 'it', 'its', 'of', 'on', 'or', 'that', 'the', 'this', 'to', 'was',
+    'were', 'which', 'with',
+}
+
+def get_stopwords():
+    """English stopwords from nltk, or a small built-in list if the corpus is missing"""
+    try:
+        from nltk.corpus import stopwords
+        return set(stopwords.words('english'))
+    except LookupError:
+        logging.warning("nltk stopwords corpus not found (nltk.download('stopwords')); "
+                        "using built-in list")
+        return set(FALLBACK_STOPWORDS)
+
+def normalize_notes(notes):
+    """Lower-case and collapse whitespace for a whole Series at once"""
+    return notes.str.lower().str.replace(r'\s+', ' ', regex=True).str.strip()
+
+def _tokenize_batch(texts, ngram_range, stopwords):
+    """Tokenize normalized texts into unigrams plus joined n-grams (runs in worker processes)"""
+    from nltk.tokenize import RegexpTokenizer
+    from nltk.util import ngrams
+
+    tokenizer = RegexpTokenizer(TOKEN_PATTERN)
+    low, high = ngram_range
+    results = []
+    for text in texts:
+        words = [w for w in tokenizer.tokenize(text) if w not in stopwords]
+        tokens = []
+        for n in range(low, high + 1):
+            tokens.extend(words if n == 1 else ('_'.join(g) for g in ngrams(words, n)))
+        results.append(tokens)
+    return results
+
+def note_key(text, config):
+    """Cache key: hash of the normalized note and the tokenizer settings"""
+    return hashlib.sha1((config + '\0' + text).encode()).hexdigest()
+
+def _read_cache(conn, keys):
+    """Cached tokens for the given keys"""
+    found = {}
+    keys = list(keys)
+    for i in range(0, len(keys), 900):  # stay under SQLite's bound-parameter limit
+        batch = keys[i:i + 900]
+        rows = conn.execute(f"SELECT key, tokens FROM tokens WHERE key IN "
+                            f"({','.join('?' * len(batch))})", batch)
+        found.update((key, json.loads(tokens)) for key, tokens in rows)
+    return found
+
+def tokenize_notes(notes, ngram_range=(1, 2), cache_path=DEFAULT_CACHE, workers=None,
+                   batch_size=BATCH_SIZE, remove_stopwords=True):
+    """Token lists for a Series of notes, aligned to its index (missing notes give [])"""
+    normalized = normalize_notes(notes.dropna().astype(str))
+    unique_texts = normalized.unique()
+
+    stopwords = get_stopwords() if remove_stopwords else set()
+    config = json.dumps({'pattern': TOKEN_PATTERN, 'ngram_range': list(ngram_range),
+                         'stopwords': sorted(stopwords)})
+    keys = {text: note_key(text, config) for text in unique_texts}
+
+    conn = None
+    tokens_by_key = {}
+    if cache_path:
+        os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+        conn = sqlite3.connect(cache_path)
+        conn.execute('CREATE TABLE IF NOT EXISTS tokens (key TEXT PRIMARY KEY, tokens TEXT)')
+        tokens_by_key = _read_cache(conn, keys.values())
+
+    pending = [text for text in unique_texts if keys[text] not in tokens_by_key]
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+
+    if workers == 1 or len(batches) <= 1:
+        results = [_tokenize_batch(b, ngram_range, stopwords) for b in batches]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_tokenize_batch, batches,
+                                    [ngram_range] * len(batches), [stopwords] * len(batches)))
+
+    new_tokens = {keys[text]: tokens
+                  for batch, batch_tokens in zip(batches, results)
+                  for text, tokens in zip(batch, batch_tokens)}
+    tokens_by_key.update(new_tokens)
+
+    if conn is not None:
+        with conn:
+            conn.executemany('INSERT OR REPLACE INTO tokens VALUES (?, ?)',
+                             [(k, json.dumps(v)) for k, v in new_tokens.items()])
+        conn.close()
+
+    logging.info(f"Tokenized {len(normalized)} notes: {len(unique_texts)} unique, "
+                 f"{len(unique_texts) - len(pending)} from cache, {len(pending)} processed")
+
+    tokens = normalized.map(lambda text: tokens_by_key[keys[text]])
+    return tokens.reindex(notes.index).apply(lambda t: t if isinstance(t, list) else [])
+
+def main(argv=None):
+    """Tokenize the Notes of one or more inventory years and show the most common tokens"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('years', nargs='*', type=int, help='inventory years (default: all known)')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes')
+    parser.add_argument('--ngram-max', type=int, default=2, help='longest n-gram to build')
+    parser.add_argument('--cache', default=DEFAULT_CACHE, help='token cache path')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    from facility_inventory import load_inventories
+    df = load_inventories(args.years)
+    tokens = tokenize_notes(df['Notes'], (1, args.ngram_max), args.cache, args.workers)
+    print(tokens.explode().value_counts().head(30).to_string())
+
+if __name__ == "__main__":
+    main()
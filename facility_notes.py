@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Facility Notes Year Extraction
+Pulls every plausible year mentioned in the Facility Inventory Notes with one vectorized regex
+pass and compares them with each facility's Year Built and Condition Assessment Date
+
+Example:
+    python facility_notes.py 2019 --benchmark
+"""
+
+import argparse
+import datetime
+import logging
+import re
+import time
+
+# Four digits not embedded in a longer number (so IDs and phone numbers don't match)
+YEAR_PATTERN = re.compile(r'(?<!\d)(?P<note_year>\d{4})(?!\d)')
+
+# Oldest plausible construction year; notes may mention planned work a few years ahead
+MIN_YEAR = 1800
+MAX_YEARS_AHEAD = 10
+
+def extract_note_years(df, notes_col='Notes', min_year=MIN_YEAR, max_year=None):
+    """One row per plausible year mentioned in a note, indexed by (facility row, match)"""
+    max_year = max_year or datetime.date.today().year + MAX_YEARS_AHEAD
+
+    years = df[notes_col].dropna().str.extractall(YEAR_PATTERN)
+    years['note_year'] = years['note_year'].astype('int16')
+    years = years[years['note_year'].between(min_year, max_year)]
+
+    logging.info(f"Found {len(years)} year mentions in "
+                 f"{years.index.get_level_values(0).nunique()} notes")
+    return years
+
+def year_disagreement_report(df, years):
+    """Compare note years with Year Built and the Condition Assessment Date per facility
+
+    predates_built: a note mentions a year before the recorded Year Built
+    after_assessment: a note mentions a year after the condition assessment
+    """
+    by_facility = years.groupby(level=0)['note_year'].agg(
+        earliest_note_year='min', latest_note_year='max', n_years='count')
+
+    report = df[['Agency Name', 'Year Built', 'Condition Assessment Date']].join(
+        by_facility, how='inner')
+    assessment_year = report['Condition Assessment Date'].dt.year.astype('Int16')
+
+    # Any mention equal to Year Built, checked on the long table without per-row loops
+    built = df['Year Built'].reindex(years.index.get_level_values(0)).to_numpy(
+        dtype='float64', na_value=float('nan'))
+    mentions_built = (years['note_year'].to_numpy() == built)
+    report['mentions_year_built'] = (
+        years.assign(m=mentions_built).groupby(level=0)['m'].any().reindex(report.index))
+
+    report['built_diff'] = report['earliest_note_year'] - report['Year Built']
+    report['predates_built'] = (report['built_diff'] < 0).fillna(False)
+    report['assessment_diff'] = report['latest_note_year'] - assessment_year
+    report['after_assessment'] = (report['assessment_diff'] > 0).fillna(False)
+
+    logging.info(f"{int(report['predates_built'].sum())} facilities mention a year before Year Built, "
+                 f"{int(report['after_assessment'].sum())} a year after their condition assessment")
+    return report
+
+def benchmark_extraction(df, scales=(1, 4, 16), repeats=3):
+    """Time extraction + report on the inventory replicated 1x, 4x, 16x (multi-year sized)"""
+    import pandas as pd
+
+    results = []
+    for scale in scales:
+        data = pd.concat([df] * scale, ignore_index=True)
+        best = float('inf')
+        for _ in range(repeats):
+            start = time.perf_counter()
+            year_disagreement_report(data, extract_note_years(data))
+            best = min(best, time.perf_counter() - start)
+        results.append({'rows': len(data), 'notes': int(data['Notes'].notna().sum()),
+                        'seconds': best, 'rows_per_s': len(data) / best})
+    return pd.DataFrame(results)
+
+def main(argv=None):
+    """Report note years that disagree with Year Built / Condition Assessment Date"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('years', nargs='*', type=int, help='inventory years (default: all known)')
+    parser.add_argument('--benchmark', action='store_true', help='time extraction at 1x/4x/16x size')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    from facility_inventory import load_inventories
+    df = load_inventories(args.years)
+
+    report = year_disagreement_report(df, extract_note_years(df))
+    print(report[report['predates_built'] | report['after_assessment']].to_string(max_rows=40))
+
+    if args.benchmark:
+        logging.disable(logging.INFO)
+        print("\n" + benchmark_extraction(df).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Content Hashing and Output Caching for FTA Outputs
+Fingerprints input data and parameters so outputs whose inputs haven't changed are not rebuilt
+"""
+
+import filecmp
+import hashlib
+import inspect
+import json
+import logging
+import os
+import shutil
+from functools import wraps
+
+def frame_digest(df):
+    """Stable content hash of a DataFrame (columns and values, not the index)"""
+    import pandas as pd
+
+    h = hashlib.sha256()
+    h.update(json.dumps([str(c) for c in df.columns]).encode())
+    try:
+        h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    except TypeError:
+        # Nested Socrata fields (dicts/lists) are unhashable, so hash their text instead
+        df = df.astype({c: str for c in df.columns if df[c].dtype == object})
+        h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return h.hexdigest()
+
+def params_digest(*parts):
+    """Stable hash of JSON-like parameters (dicts, lists, tuples, scalars)"""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def file_digest(path):
+    """Hash of a file's bytes, e.g. a script's source so code changes invalidate outputs"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def local_imports(path):
+    """Source files of the modules next to `path` that it imports, directly or transitively
+
+    Imports inside functions count too (the scripts import helpers lazily), so editing any
+    helper a script can use changes the script's source digest.
+    """
+    import ast
+
+    root = os.path.dirname(os.path.abspath(path))
+    found, pending = set(), [os.path.abspath(path)]
+    while pending:
+        current = pending.pop()
+        if current in found:
+            continue
+        found.add(current)
+        with open(current, 'rb') as f:
+            tree = ast.parse(f.read(), filename=current)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                candidate = os.path.join(root, name.split('.')[0] + '.py')
+                if os.path.exists(candidate):
+                    pending.append(candidate)
+    return sorted(found)
+
+def source_digest(path):
+    """Hash of a script's source and of every local module it imports"""
+    root = os.path.dirname(os.path.abspath(path))
+    return params_digest([(os.path.relpath(p, root), file_digest(p)) for p in local_imports(path)])
+
+def load_manifest(path):
+    """Load the output manifest (output path -> input digest), empty if missing or unreadable"""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Ignoring unreadable manifest {path}: {e}")
+        return {}
+
+def save_manifest(manifest, path):
+    """Write the manifest atomically so an interrupted run never leaves it half-written"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def is_up_to_date(manifest, outputs, digest):
+    """True if every output exists and was last built from the same input digest"""
+    return bool(outputs) and all(
+        os.path.exists(path) and manifest.get(os.path.abspath(path)) == digest
+        for path in outputs
+    )
+
+def record_outputs(manifest, outputs, digest):
+    """Remember which input digest the outputs were built from"""
+    for path in outputs:
+        if os.path.exists(path):
+            manifest[os.path.abspath(path)] = digest
+
+# Content-addressed store of rendered outputs, keyed on input data + rendering parameters
+_output_cache = {'dir': os.environ.get('FTA_OUTPUT_CACHE', '.fta_cache'), 'enabled': True}
+_cache_stats = {'hits': 0, 'misses': 0}
+
+def _mtime(path):
+    """Modification time in ns, or None if the file doesn't exist"""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def configure_output_cache(cache_dir=None, enabled=True):
+    """Set the output cache directory, or disable caching (e.g. to force a rebuild)"""
+    if cache_dir:
+        _output_cache['dir'] = cache_dir
+    _output_cache['enabled'] = enabled
+
+def output_cache_settings():
+    """Current (cache_dir, enabled) settings, e.g. to pass on to worker processes"""
+    return _output_cache['dir'], _output_cache['enabled']
+
+def cached_output(ignore=(), display=()):
+    """Skip a render function when the same data and parameters already produced its output
+
+    The wrapped function takes the events DataFrame first and writes to an `output_file`
+    argument. Parameters listed in `ignore` don't affect the key. Those in `display` (e.g.
+    `show`) don't either, but a true value always renders, since a cache hit shows nothing.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        sources = source_digest(inspect.getsourcefile(func))
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _output_cache['enabled']:
+                return func(*args, **kwargs)
+
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = dict(bound.arguments)
+            df = arguments.pop(next(iter(signature.parameters)))
+            output_file = arguments.pop('output_file')
+            params = {k: v for k, v in arguments.items() if k not in ignore and k not in display}
+            displayed = any(arguments.get(name) for name in display)
+
+            key = params_digest(func.__qualname__, frame_digest(df), params, sources)
+            cached_file = os.path.join(_output_cache['dir'], key + os.path.splitext(output_file)[1])
+
+            if os.path.exists(cached_file) and not displayed:
+                _cache_stats['hits'] += 1
+                # Leave an identical output untouched so the site rebuild sees no change
+                if not (os.path.exists(output_file) and
+                        filecmp.cmp(cached_file, output_file, shallow=False)):
+                    os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+                    shutil.copyfile(cached_file, output_file)
+                logging.info(f"Output cache hit for {func.__name__}: {output_file} is up to date")
+                return output_file
+
+            if not displayed:
+                _cache_stats['misses'] += 1
+                logging.info(f"Output cache miss for {func.__name__}, rendering {output_file}")
+            before = _mtime(output_file)
+            result = func(*args, **kwargs)
+
+            # Only store outputs this call actually wrote (not a stale file left from before)
+            if _mtime(output_file) not in (None, before):
+                os.makedirs(_output_cache['dir'], exist_ok=True)
+                tmp_file = cached_file + '.tmp'
+                shutil.copyfile(output_file, tmp_file)
+                os.replace(tmp_file, cached_file)
+            return result
+        return wrapper
+    return decorator
+
+def cache_stats():
+    """Output cache hit/miss counts for this process"""
+    return dict(_cache_stats)
+
+def log_cache_stats():
+    """Log output cache hit/miss statistics"""
+    total = _cache_stats['hits'] + _cache_stats['misses']
+    if total:
+        logging.info(f"Output cache: {_cache_stats['hits']} hits, {_cache_stats['misses']} misses "
+                     f"({_cache_stats['hits'] / total:.0%} hit rate)")
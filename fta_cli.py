@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+FTA Batch Runner
+Runs any combination of the FTA reports and maps from a TOML or YAML job file
+
+Example:
+    python fta_cli.py fta_jobs.toml --jobs 4
+"""
+
+import argparse
+import importlib
+import inspect
+import io
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stdout
+
+from fta_cache import (frame_digest, params_digest, source_digest, load_manifest,
+                       save_manifest, is_up_to_date, record_outputs,
+                       configure_output_cache, output_cache_settings, log_cache_stats)
+from fta_event_store import load_events
+from fta_instrumentation import stage, add_profile_arguments, start_profiling, finish_profiling
+from fta_report import report_paths
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+# Job type -> script module providing run_pipeline()
+JOB_TYPES = {
+    'safety_analysis': 'fta_safety_analysis',
+    'deadly_events_map': 'fta_deadly_events_map',
+    'nyc_basemap': 'fta_nyc_basemap',
+    'time_slider_map': 'fta_nyc_time_slider_map',
+}
+
+# Job keys handled by the runner rather than passed to run_pipeline()
+RUNNER_KEYS = {'name', 'type', 'output', 'report'}
+
+# Dataset shared by every job in this process (set directly or by the pool initializer)
+_shared_df = None
+
+def load_job_file(path):
+    """Load a job file: a [data] table and a list of [[jobs]]"""
+    if path.endswith(('.yaml', '.yml')):
+        try:
+            import yaml
+        except ImportError:
+            raise SystemExit("PyYAML is required for YAML job files (pip install pyyaml)")
+        with open(path) as f:
+            config = yaml.safe_load(f) or {}
+    else:
+        import tomllib
+        with open(path, 'rb') as f:
+            config = tomllib.load(f)
+
+    jobs = config.get('jobs', [])
+    for i, job in enumerate(jobs):
+        if job.get('type') not in JOB_TYPES:
+            raise SystemExit(f"Job {i}: unknown type {job.get('type')!r}, "
+                             f"expected one of {sorted(JOB_TYPES)}")
+        job.setdefault('name', f"{job['type']}_{i}")
+
+    return config.get('data', {}), jobs
+
+def job_outputs(job):
+    """Files a job writes"""
+    outputs = [job[key] for key in ('output', 'report') if job.get(key)]
+    if job.get('report_file'):
+        outputs += report_paths(job['report_file'])
+    return outputs
+
+def job_kwargs(job):
+    """Translate job keys to run_pipeline() keyword arguments"""
+    module = importlib.import_module(JOB_TYPES[job['type']])
+    accepted = inspect.signature(module.run_pipeline).parameters
+
+    kwargs = {}
+    for key, value in job.items():
+        if key in RUNNER_KEYS:
+            continue
+        if key not in accepted:
+            raise SystemExit(f"Job {job['name']}: {job['type']} does not accept {key!r}")
+        kwargs[key] = tuple(value) if key == 'bounds' else value
+
+    if job.get('output'):
+        kwargs['output_file'] = job['output']
+    if 'show' in accepted:
+        kwargs['show'] = False
+    return module, kwargs
+
+def job_digest(job, data_digest):
+    """Digest of everything a job's outputs depend on: data, job settings and the source of the
+    script and of the local modules it imports"""
+    module = importlib.import_module(JOB_TYPES[job['type']])
+    return params_digest(data_digest, job, source_digest(module.__file__))
+
+def _init_worker(df, cache_dir, cache_enabled):
+    """Process pool initializer: receive the shared dataset and cache settings once per worker"""
+    global _shared_df
+    _shared_df = df
+    configure_output_cache(cache_dir, cache_enabled)
+
+def run_job(job):
+    """Run one job against the shared dataset and return its captured report text
+
+    Raises RuntimeError when run_pipeline() reports a failure, so its outputs aren't recorded.
+    """
+    module, kwargs = job_kwargs(job)
+    for path in job_outputs(job):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    buffer = io.StringIO()
+    with stage(job['name']), redirect_stdout(buffer):
+        succeeded = module.run_pipeline(df=_shared_df, **kwargs)
+    if not succeeded:
+        raise RuntimeError(f"{job['type']} produced no outputs (see the errors above)")
+
+    report = buffer.getvalue()
+    if job.get('report'):
+        with open(job['report'], 'w') as f:
+            f.write(report)
+    return report
+
+def run_jobs(jobs, df, n_jobs=1, manifest_path=None, force=False):
+    """Run jobs against one loaded dataset, skipping those whose inputs haven't changed"""
+    global _shared_df
+    _shared_df = df
+
+    manifest = load_manifest(manifest_path) if manifest_path else {}
+    with stage('hash_inputs'):
+        data_digest = frame_digest(df)
+
+    pending = []
+    for job in jobs:
+        digest = job_digest(job, data_digest)
+        if not force and is_up_to_date(manifest, job_outputs(job), digest):
+            logging.info(f"Skipping {job['name']}: inputs unchanged")
+        else:
+            pending.append((job, digest))
+
+    def finished(job, digest, report):
+        print(report, end='')
+        record_outputs(manifest, job_outputs(job), digest)
+        logging.info(f"Finished {job['name']}")
+
+    failures = 0
+    if n_jobs > 1 and len(pending) > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                 initargs=(df, *output_cache_settings())) as pool:
+            futures = {pool.submit(run_job, job): (job, digest) for job, digest in pending}
+            for future in as_completed(futures):
+                job, digest = futures[future]
+                try:
+                    finished(job, digest, future.result())
+                except Exception as e:
+                    logging.error(f"Job {job['name']} failed: {e}")
+                    failures += 1
+    else:
+        for job, digest in pending:
+            try:
+                finished(job, digest, run_job(job))
+            except Exception as e:
+                logging.error(f"Job {job['name']} failed: {e}")
+                failures += 1
+
+    if manifest_path:
+        save_manifest(manifest, manifest_path)
+    log_cache_stats()
+
+    logging.info(f"{len(pending) - failures} jobs run, {len(jobs) - len(pending)} skipped, "
+                 f"{failures} failed")
+    return failures
+
+def main(argv=None):
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('job_file', help='TOML or YAML job file')
+    parser.add_argument('--jobs', type=int, default=1, help='number of jobs to run in parallel')
+    parser.add_argument('--only', nargs='+', help='run only the named jobs')
+    parser.add_argument('--force', action='store_true', help='rebuild outputs even if unchanged')
+    parser.add_argument('--refresh-store', action='store_true',
+                        help='re-download the events into the [data] store before running')
+    parser.add_argument('--cache-dir', default=None,
+                        help='rendered output cache directory (default: $FTA_OUTPUT_CACHE or .fta_cache)')
+    parser.add_argument('--manifest', default=None,
+                        help='output manifest path (default: .fta_manifest.json beside the job file)')
+    add_profile_arguments(parser)
+    args = parser.parse_args(argv)
+
+    data, jobs = load_job_file(args.job_file)
+    if args.only:
+        jobs = [job for job in jobs if job['name'] in args.only]
+    manifest_path = args.manifest or os.path.join(
+        os.path.dirname(os.path.abspath(args.job_file)), '.fta_manifest.json')
+
+    configure_output_cache(args.cache_dir, enabled=not args.force)
+
+    start_profiling(args)
+    try:
+        # Every script loads the same dataset, so load it once for all jobs
+        from fta_safety_analysis import load_fta_data, FTA_EVENTS_URL, DEFAULT_LIMIT
+        url, limit = data.get('url', FTA_EVENTS_URL), data.get('limit', DEFAULT_LIMIT)
+        if data.get('store'):
+            df = load_events(data['store'], lambda: load_fta_data(url, limit),
+                             refresh=args.refresh_store)
+        else:
+            df = load_fta_data(url, limit)
+        if df is None:
+            logging.error("Cannot proceed without data")
+            return 1
+
+        return 1 if run_jobs(jobs, df, args.jobs, manifest_path, args.force) else 0
+    finally:
+        finish_profiling(args, 'fta_cli')
+
+if __name__ == "__main__":
+    raise SystemExit(main())
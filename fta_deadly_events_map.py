@@ -5,36 +5,51 @@ Creates maps showing locations of fatal transit incidents
 """
 
 import pandas as pd
-import matplotlib.pyplot as plt
 import logging
+import argparse
+
+from fta_cache import cached_output, log_cache_stats
+from fta_event_store import load_events, add_store_arguments, MAP_COLUMNS
+from fta_instrumentation import instrumented, add_profile_arguments, start_profiling, finish_profiling
+from fta_rank_stats import rank_intervals
+from fta_report import Report
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 
-def load_fta_data():
-    """Load FTA Major Safety Events data from data.transportation.gov"""
-    url = "https://data.transportation.gov/resource/9ivb-8ae9.json"
+# Socrata API endpoint for Major Safety Events dataset
+FTA_EVENTS_URL = "https://data.transportation.gov/resource/9ivb-8ae9.json"
+DEFAULT_LIMIT = 50000
+
+# Agency name patterns for New York, NYC, MTA, etc.
+NY_KEYWORDS = ['NEW YORK', 'NYC', 'MTA', 'METROPOLITAN TRANSPORTATION']
 
+DEFAULT_OUTPUT = 'images/fta_deadly_events_map.png'
+
+@instrumented()
+def load_fta_data(url=FTA_EVENTS_URL, limit=DEFAULT_LIMIT):
+    """Load FTA Major Safety Events data from data.transportation.gov"""
     try:
         logging.info("Downloading FTA Major Safety Events data...")
-        df = pd.read_json(url + "?$limit=50000")
+        df = pd.read_json(f"{url}?$limit={limit}")
         logging.info(f"Successfully loaded {len(df)} safety events")
         return df
     except Exception as e:
         logging.error(f"Failed to load data: {e}")
         return None
 
-def filter_new_york_data(df):
+@instrumented()
+def filter_new_york_data(df, keywords=NY_KEYWORDS):
     """Filter data for New York transit agencies"""
     logging.info("Filtering for New York transit agencies...")
 
     # Filter by agency names containing New York, NYC, MTA, etc.
-    ny_keywords = ['NEW YORK', 'NYC', 'MTA', 'METROPOLITAN TRANSPORTATION']
-    ny_data = df[df['agency'].str.upper().str.contains('|'.join(ny_keywords), na=False)]
+    ny_data = df[df['agency'].str.upper().str.contains('|'.join(keywords), na=False)]
 
     logging.info(f"Found {len(ny_data)} incidents in New York")
     return ny_data
 
+@instrumented()
 def prepare_fatal_events(df):
     """Extract events with fatalities and valid coordinates"""
     logging.info("Filtering for fatal events with location data...")
@@ -57,13 +72,21 @@ def prepare_fatal_events(df):
 
     return fatal_df
 
-def create_visualizations(df):
+@instrumented()
+@cached_output(display=('show',))
+def create_visualizations(df, output_file=DEFAULT_OUTPUT, show=True):
     """Create multiple visualizations of fatal events"""
 
     if len(df) == 0:
         logging.warning("No fatal events with coordinates found")
         return
 
+    # Load matplotlib only when plotting; no GUI backend is needed just to save a file
+    import matplotlib
+    if not show:
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
     # Create figure with multiple subplots
     fig, axes = plt.subplots(2, 2, figsize=(16, 14))
     fig.suptitle('New York Transit Fatal Incidents - Location Analysis (FTA Data)',
@@ -150,93 +173,130 @@ def create_visualizations(df):
     plt.tight_layout()
 
     # Save the figure
-    output_file = '/Users/Joe/fta_deadly_events_map.png'
     plt.savefig(output_file, dpi=300, bbox_inches='tight')
     logging.info(f"Visualization saved to: {output_file}")
 
-    plt.show()
+    if show:
+        plt.show()
+    else:
+        plt.close(fig)
 
     return output_file
 
+def _group_mode(df, keys, column):
+    """Most common value of `column` per group (ties go to the smallest), without per-group calls"""
+    counts = df.groupby(keys + [column]).size().rename('n').reset_index()
+    counts = counts.sort_values(['n', column], ascending=[False, True], kind='stable')
+    return counts.drop_duplicates(keys).set_index(keys)[column]
+
+@instrumented()
 def print_deadliest_locations(df):
-    """Print detailed information about deadliest locations"""
-    print("\n" + "="*70)
-    print("DEADLIEST LOCATIONS ANALYSIS")
-    print("="*70)
+    """Print detailed information about deadliest locations; returns the Report"""
+    report = Report("Deadliest Locations Analysis")
 
     if len(df) == 0:
-        print("\nNo fatal incidents with location data found.")
-        return
+        report.facts('status', {'Fatal incidents with location data': 0})
+        report.show()
+        return report
 
     # Group by approximate location (round coordinates)
     df['lat_rounded'] = df['latitude'].round(3)
     df['lon_rounded'] = df['longitude'].round(3)
-
-    location_fatalities = df.groupby(['lat_rounded', 'lon_rounded']).agg({
-        'total_fatalities': 'sum',
-        'incident_date': 'count',
-        'event_type': lambda x: x.mode()[0] if len(x) > 0 else 'Unknown',
-        'location_type': lambda x: x.mode()[0] if len(x) > 0 else 'Unknown'
-    }).rename(columns={'incident_date': 'num_incidents'})
-
+    keys = ['lat_rounded', 'lon_rounded']
+
+    location_fatalities = df.groupby(keys).agg(
+        total_fatalities=('total_fatalities', 'sum'),
+        num_incidents=('incident_date', 'count'))
+    for column in ['event_type', 'location_type']:
+        location_fatalities[column] = _group_mode(df, keys, column).reindex(
+            location_fatalities.index).fillna('Unknown')
+    # Bootstrap intervals on each location's deaths and on its rank among all locations
+    ranking = rank_intervals(df, keys, top=15)
+    location_fatalities = location_fatalities.join(
+        ranking[['lower', 'upper', 'rank_lower', 'rank_upper', 'p_top']])
     location_fatalities = location_fatalities.sort_values('total_fatalities', ascending=False)
 
-    print("\nTop 15 Deadliest Locations (by approximate coordinates):")
-    print("-" * 70)
-    print(f"{'Latitude':<12} {'Longitude':<12} {'Deaths':<8} {'Incidents':<10} {'Type':<20}")
-    print("-" * 70)
-
-    for idx, row in location_fatalities.head(15).iterrows():
-        lat, lon = idx
-        print(f"{lat:<12.3f} {lon:<12.3f} {int(row['total_fatalities']):<8} "
-              f"{int(row['num_incidents']):<10} {str(row['event_type']):<20}")
-
-    # Print incidents with highest single fatality count
-    print("\n" + "="*70)
-    print("SINGLE DEADLIEST INCIDENTS")
-    print("="*70)
-
-    deadliest = df.nlargest(10, 'total_fatalities')
-    for idx, row in deadliest.iterrows():
-        print(f"\nDate: {row['incident_date']}")
-        print(f"Location: ({row['latitude']:.4f}, {row['longitude']:.4f})")
-        print(f"Event Type: {row.get('event_type', 'Unknown')}")
-        print(f"Location Type: {row.get('location_type', 'Unknown')}")
-        print(f"Fatalities: {int(row['total_fatalities'])}")
-        print(f"Injuries: {int(row['total_injuries'])}")
-        if 'approximate_address' in row and pd.notna(row['approximate_address']):
-            print(f"Address: {row['approximate_address']}")
-
-def main():
-    """Main execution function"""
+    report.table('deadliest_locations', location_fatalities.head(15).reset_index().rename(columns={
+                     'lat_rounded': 'latitude', 'lon_rounded': 'longitude',
+                     'total_fatalities': 'deaths', 'num_incidents': 'incidents',
+                     'lower': 'deaths_lower', 'upper': 'deaths_upper', 'p_top': 'p_top15'}),
+                 "Top 15 Deadliest Locations (by approximate coordinates, 95% bootstrap intervals)",
+                 formats={'latitude': '%.3f', 'longitude': '%.3f', 'deaths': '%d', 'incidents': '%d',
+                          'deaths_lower': '%.0f', 'deaths_upper': '%.0f', 'p_top15': '%.2f'})
+
+    # Incidents with highest single fatality count
+    columns = [c for c in ['incident_date', 'latitude', 'longitude', 'event_type', 'location_type',
+                           'total_fatalities', 'total_injuries', 'approximate_address']
+               if c in df.columns]
+    report.table('deadliest_incidents', df.nlargest(10, 'total_fatalities')[columns],
+                 "Single Deadliest Incidents",
+                 formats={'incident_date': '%Y-%m-%d', 'latitude': '%.4f', 'longitude': '%.4f',
+                          'total_fatalities': '%d', 'total_injuries': '%d'})
+
+    report.show()
+    return report
+
+def run_pipeline(df=None, url=FTA_EVENTS_URL, limit=DEFAULT_LIMIT, keywords=NY_KEYWORDS,
+                 output_file=DEFAULT_OUTPUT, show=True, store=None, refresh_store=False,
+                 report_file=None):
+    """Load, filter and analyze the data; returns True once the outputs are written"""
     logging.info("Starting FTA Deadly Events Visualization...")
 
-    # Load data
-    df = load_fta_data()
+    # Load data unless a caller already has it, reading only the needed rows from a store
+    if df is None and store:
+        df = load_events(store, lambda: load_fta_data(url, limit), refresh=refresh_store,
+                         columns=MAP_COLUMNS, agency_keywords=keywords, fatal_only=True)
+    elif df is None:
+        df = load_fta_data(url, limit)
     if df is None:
         logging.error("Cannot proceed without data")
-        return
+        return False
 
     # Filter for New York
-    ny_df = filter_new_york_data(df)
+    ny_df = filter_new_york_data(df, keywords)
 
     # Get fatal events with coordinates
     fatal_df = prepare_fatal_events(ny_df)
 
     if len(fatal_df) == 0:
         logging.error("No fatal incidents with coordinates found for New York")
-        return
+        return False
 
     # Print detailed location analysis
-    print_deadliest_locations(fatal_df)
+    report = print_deadliest_locations(fatal_df)
+    if report_file:
+        logging.info(f"Report written to {', '.join(report.write(report_file))}")
 
     # Create visualizations
-    output_file = create_visualizations(fatal_df)
+    output_file = create_visualizations(fatal_df, output_file, show)
 
     print("\n" + "="*70)
     print("ANALYSIS COMPLETE")
     print("="*70)
     print(f"\nVisualization saved to: {output_file}")
+    return True
+
+def main(argv=None):
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', default=FTA_EVENTS_URL, help='Major Safety Events API endpoint')
+    parser.add_argument('--limit', type=int, default=DEFAULT_LIMIT, help='maximum number of events to download')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='output file path')
+    parser.add_argument('--report-file', default=None,
+                        help='also write the report as Markdown, CSV and JSON (path without extension)')
+    add_store_arguments(parser)
+    add_profile_arguments(parser)
+    args = parser.parse_args(argv)
+
+    start_profiling(args)
+    try:
+        if not run_pipeline(url=args.url, limit=args.limit, store=args.store,
+                            refresh_store=args.refresh_store, output_file=args.output,
+                            report_file=args.report_file):
+            raise SystemExit(1)
+    finally:
+        log_cache_stats()
+        finish_profiling(args, 'fta_deadly_events_map')
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+FTA Processed Event Store
+Keeps the normalized Major Safety Events in a local SQLite database so scripts can read only
+the rows and columns they need instead of downloading the national dataset every run
+
+Example:
+    python fta_event_store.py --refresh
+    python fta_event_store.py --agency MTA --fatal-only --years 2015 2024
+"""
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+DEFAULT_STORE = 'fta_events.sqlite'
+
+# Columns the map scripts use; reading only these is the projection pushdown
+MAP_COLUMNS = ['agency', 'incident_date', 'year', 'event_type', 'location_type',
+               'total_fatalities', 'total_injuries', 'latitude', 'longitude',
+               'approximate_address']
+
+# Range-filtered columns of read_events(); each gets an index. Agency keywords match anywhere
+# in the name (e.g. 'MTA' inside a longer agency name), which no B-tree index can serve
+INDEXED_COLUMNS = ['year', 'total_fatalities', 'latitude']
+
+def normalize_events(df):
+    """Coerce types so the stored events are consistent across downloads"""
+    import pandas as pd
+
+    df = df.copy()
+    for col in ('total_fatalities', 'total_injuries', 'latitude', 'longitude'):
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+
+    if 'incident_date' in df.columns:
+        dates = pd.to_datetime(df['incident_date'], errors='coerce')
+        df['incident_date'] = dates.dt.strftime('%Y-%m-%dT%H:%M:%S')
+        if 'year' not in df.columns:
+            df['year'] = dates.dt.year.astype('Int64')
+
+    # Nested Socrata fields (e.g. geolocation) are stored as JSON text
+    for col in df.columns[df.dtypes == object]:
+        if df[col].map(lambda v: isinstance(v, (dict, list))).any():
+            df[col] = df[col].map(lambda v: json.dumps(v) if isinstance(v, (dict, list)) else v)
+
+    return df
+
+def write_events(df, path=DEFAULT_STORE, digest=None):
+    """Replace the stored events with a normalized copy of df"""
+    from fta_cache import frame_digest
+
+    events = normalize_events(df)
+    with closing(sqlite3.connect(path)) as conn, conn:
+        events.to_sql('events', conn, if_exists='replace', index=False, chunksize=5000)
+        for col in INDEXED_COLUMNS:
+            if col in events.columns:
+                conn.execute(f'CREATE INDEX IF NOT EXISTS idx_events_{col} ON events ("{col}")')
+        conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        conn.executemany('INSERT OR REPLACE INTO meta VALUES (?, ?)', [
+            ('digest', digest or frame_digest(df)),
+            ('loaded_at', time.strftime('%Y-%m-%dT%H:%M:%S')),
+            ('rows', str(len(events))),
+        ])
+
+    logging.info(f"Stored {len(events)} normalized events in {path}")
+    return path
+
+def store_columns(path=DEFAULT_STORE):
+    """Column names available in the store"""
+    with closing(sqlite3.connect(path)) as conn:
+        return [row[1] for row in conn.execute('PRAGMA table_info(events)')]
+
+def stored_digest(path=DEFAULT_STORE):
+    """Content digest of the data the store was last written from, or None"""
+    with closing(sqlite3.connect(path)) as conn:
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'digest'").fetchone()
+        except sqlite3.OperationalError:
+            return None
+    return row[0] if row else None
+
+def read_events(path=DEFAULT_STORE, columns=None, agency_keywords=None, years=None,
+                fatal_only=False, bounds=None):
+    """Read events from the store, filtering in SQL rather than in pandas
+
+    columns: only these columns are read (missing ones are ignored)
+    agency_keywords: keep agencies whose upper-cased name contains any keyword
+    years: inclusive (first, last) range of incident years
+    bounds: (min lat, max lat, min lon, max lon)
+    """
+    import pandas as pd
+
+    available = store_columns(path)
+    selected = [c for c in columns if c in available] if columns else available
+    clauses, params = [], []
+
+    if agency_keywords:
+        clauses.append('(' + ' OR '.join('instr(upper(agency), ?) > 0' for _ in agency_keywords) + ')')
+        params.extend(k.upper() for k in agency_keywords)
+    if years:
+        clauses.append('year BETWEEN ? AND ?')
+        params.extend(int(y) for y in years)
+    if fatal_only:
+        clauses.append('total_fatalities > 0')
+    if bounds:
+        clauses.append('latitude BETWEEN ? AND ? AND longitude BETWEEN ? AND ?')
+        params.extend(bounds)
+
+    query = 'SELECT ' + ', '.join(f'"{c}"' for c in selected) + ' FROM events'
+    if clauses:
+        query += ' WHERE ' + ' AND '.join(clauses)
+
+    with closing(sqlite3.connect(path)) as conn:
+        df = pd.read_sql_query(query, conn, params=params)
+
+    if 'incident_date' in df.columns:
+        df['incident_date'] = pd.to_datetime(df['incident_date'], errors='coerce')
+
+    logging.info(f"Read {len(df)} events ({len(selected)} columns) from {path}")
+    return df
+
+def load_events(path, download, refresh=False, **predicates):
+    """Read events from the store, populating it first with download() if missing or refreshing
+
+    A refresh that downloads the same data as last time leaves the store untouched.
+    """
+    from fta_cache import frame_digest
+
+    if refresh or not os.path.exists(path):
+        df = download()
+        if df is None:
+            return None
+        digest = frame_digest(df)
+        if os.path.exists(path) and stored_digest(path) == digest:
+            logging.info(f"Downloaded events are unchanged; keeping {path}")
+        else:
+            write_events(df, path, digest)
+    return read_events(path, **predicates)
+
+def add_store_arguments(parser):
+    """Add the shared --store options to a script's argument parser"""
+    parser.add_argument('--store', default=None,
+                        help=f'read events from this SQLite store (e.g. {DEFAULT_STORE}), '
+                             'downloading into it on first use')
+    parser.add_argument('--refresh-store', action='store_true',
+                        help='re-download the events into the store before reading')
+
+def main(argv=None):
+    """Build the store or query it from the command line"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--store', default=DEFAULT_STORE, help='SQLite store path')
+    parser.add_argument('--refresh', action='store_true', help='download events into the store')
+    parser.add_argument('--agency', nargs='+', help='agency name keywords')
+    parser.add_argument('--years', nargs=2, type=int, metavar=('FIRST', 'LAST'))
+    parser.add_argument('--fatal-only', action='store_true')
+    parser.add_argument('--columns', nargs='+', default=None)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    from fta_safety_analysis import load_fta_data
+    df = load_events(args.store, load_fta_data, refresh=args.refresh, columns=args.columns,
+                     agency_keywords=args.agency, years=args.years, fatal_only=args.fatal_only)
+    if df is None:
+        logging.error("Cannot proceed without data")
+        return 1
+    print(df.head(20))
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
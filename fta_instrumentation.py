@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Pipeline Stage Instrumentation
+Records wall time, CPU time, peak memory and rows in/out for each pipeline stage,
+prints a stage timing table and writes a trace file that can be compared across runs
+"""
+
+import argparse
+import cProfile
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from functools import wraps
+
+# Instrumentation is off until a script's main() turns it on with --profile
+_enabled = False
+_profile_dir = None
+_records = []
+_stack = []
+
+def configure(enabled=True, profile_dir=None):
+    """Turn stage recording on/off and optionally dump a cProfile file per stage"""
+    global _enabled, _profile_dir
+    _enabled = enabled
+    _profile_dir = profile_dir
+    _records.clear()
+    _stack.clear()
+
+    if profile_dir:
+        os.makedirs(profile_dir, exist_ok=True)
+    if enabled and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+def _row_count(obj):
+    """Best-effort row count for DataFrames, arrays and lists"""
+    shape = getattr(obj, 'shape', None)
+    if shape:
+        return int(shape[0])
+    if isinstance(obj, (list, tuple)):
+        return len(obj)
+    return None
+
+@contextmanager
+def stage(name, rows_in=None):
+    """Record one pipeline stage; set record['rows_out'] inside the block if known"""
+    record = {'stage': name, 'depth': len(_stack), 'rows_in': rows_in, 'rows_out': None}
+
+    if not _enabled:
+        yield record
+        return
+
+    # cProfile cannot nest, so only outermost stages get their own profile
+    profiler = None
+    if _profile_dir and not _stack:
+        profiler = cProfile.Profile()
+
+    _stack.append(record)
+    tracemalloc.reset_peak()
+    mem_start = tracemalloc.get_traced_memory()[0]
+    record['_child_peak'] = 0
+    record['start'] = time.time()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    if profiler:
+        profiler.enable()
+
+    try:
+        yield record
+    finally:
+        if profiler:
+            profiler.disable()
+            safe_name = ''.join(c if c.isalnum() else '_' for c in name)
+            profiler.dump_stats(os.path.join(_profile_dir, f"{safe_name}.prof"))
+
+        record['wall_s'] = time.perf_counter() - wall_start
+        record['cpu_s'] = time.process_time() - cpu_start
+
+        # Inner stages reset the tracemalloc peak, so fold their peaks back in
+        peak = max(tracemalloc.get_traced_memory()[1], record.pop('_child_peak'))
+        record['peak_mb'] = max(peak - mem_start, 0) / 1024**2
+        _stack.pop()
+        if _stack:
+            _stack[-1]['_child_peak'] = max(_stack[-1]['_child_peak'], peak)
+
+        _records.append(record)
+        logging.debug(f"Stage {name}: {record['wall_s']:.3f}s wall, "
+                      f"{record['cpu_s']:.3f}s CPU, {record['peak_mb']:.1f} MB peak")
+
+def instrumented(name=None):
+    """Decorator form of stage(); rows in/out come from the first argument and the result"""
+    def decorator(func):
+        stage_name = name or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+
+            rows_in = _row_count(args[0]) if args else None
+            with stage(stage_name, rows_in=rows_in) as record:
+                result = func(*args, **kwargs)
+                record['rows_out'] = _row_count(result)
+            return result
+        return wrapper
+    return decorator
+
+def get_records():
+    """Return completed stage records in completion order"""
+    return list(_records)
+
+def print_stage_table(records=None):
+    """Print a stage timing table"""
+    records = get_records() if records is None else records
+
+    print("\n" + "="*70)
+    print("STAGE TIMINGS")
+    print("="*70)
+    print(f"{'Stage':<30} {'Wall s':>8} {'CPU s':>8} {'Peak MB':>9} {'Rows in':>8} {'Rows out':>8}")
+    print("-" * 70)
+
+    # Records complete inner-first; show them in start order with nesting
+    for rec in sorted(records, key=lambda r: r['start']):
+        label = ('  ' * rec['depth'] + rec['stage'])[:30]
+        rows_in = '' if rec['rows_in'] is None else rec['rows_in']
+        rows_out = '' if rec['rows_out'] is None else rec['rows_out']
+        print(f"{label:<30} {rec['wall_s']:>8.3f} {rec['cpu_s']:>8.3f} {rec['peak_mb']:>9.1f} "
+              f"{rows_in:>8} {rows_out:>8}")
+
+def write_trace(path, records=None, run_name=None):
+    """Write records as a Chrome trace (chrome://tracing, Perfetto) with stage metrics in args"""
+    records = get_records() if records is None else records
+    origin = min((r['start'] for r in records), default=0)
+
+    events = []
+    for rec in records:
+        events.append({
+            'name': rec['stage'],
+            'ph': 'X',
+            'pid': os.getpid(),
+            'tid': 0,
+            'ts': (rec['start'] - origin) * 1e6,
+            'dur': rec['wall_s'] * 1e6,
+            'args': {k: rec[k] for k in ('cpu_s', 'peak_mb', 'rows_in', 'rows_out')}
+        })
+
+    trace = {
+        'traceEvents': events,
+        'metadata': {'run': run_name or os.path.basename(sys.argv[0]), 'started': origin}
+    }
+    with open(path, 'w') as f:
+        json.dump(trace, f, indent=1)
+
+    logging.info(f"Stage trace written to: {path}")
+    return path
+
+def compare_traces(old_path, new_path):
+    """Print per-stage wall time and peak memory differences between two trace files"""
+    def totals(path):
+        with open(path) as f:
+            events = json.load(f)['traceEvents']
+        summary = {}
+        for ev in events:
+            wall, peak = summary.get(ev['name'], (0.0, 0.0))
+            summary[ev['name']] = (wall + ev['dur'] / 1e6, max(peak, ev['args']['peak_mb']))
+        return summary
+
+    old, new = totals(old_path), totals(new_path)
+
+    print(f"{'Stage':<30} {'Old s':>8} {'New s':>8} {'Change':>8} {'Old MB':>8} {'New MB':>8}")
+    print("-" * 76)
+    for name in list(old) + [n for n in new if n not in old]:
+        old_wall, old_peak = old.get(name, (0.0, 0.0))
+        new_wall, new_peak = new.get(name, (0.0, 0.0))
+        change = f"{(new_wall - old_wall) / old_wall:+.0%}" if old_wall else 'new'
+        print(f"{name[:30]:<30} {old_wall:>8.3f} {new_wall:>8.3f} {change:>8} "
+              f"{old_peak:>8.1f} {new_peak:>8.1f}")
+
+def add_profile_arguments(parser):
+    """Add the shared --profile options to a script's argument parser"""
+    parser.add_argument('--profile', action='store_true',
+                        help='print a stage timing table and write a trace file')
+    parser.add_argument('--trace-file', default=None,
+                        help='trace output path (default: <script>_trace.json)')
+    parser.add_argument('--profile-dir', default=None,
+                        help='also dump a cProfile .prof file per stage into this directory')
+
+def start_profiling(args):
+    """Enable instrumentation if requested on the command line"""
+    if args.profile or args.profile_dir:
+        configure(enabled=True, profile_dir=args.profile_dir)
+
+def finish_profiling(args, script_name):
+    """Print the stage table and write the trace file if profiling was enabled"""
+    if not _enabled:
+        return
+    print_stage_table()
+    write_trace(args.trace_file or f"{script_name}_trace.json", run_name=script_name)
+
+def main():
+    """Compare two trace files written by --profile"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('old_trace')
+    parser.add_argument('new_trace')
+    args = parser.parse_args()
+    compare_traces(args.old_trace, args.new_trace)
+
+if __name__ == "__main__":
+    main()
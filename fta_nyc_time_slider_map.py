@@ -5,40 +5,55 @@ Creates an interactive map with time slider showing fatal transit incidents over
 """
 
 import pandas as pd
-import folium
-from folium.plugins import HeatMapWithTime, TimestampedGeoJson
 import logging
-import json
-from datetime import datetime
+import argparse
+
+from fta_cache import cached_output, log_cache_stats
+from fta_event_store import load_events, add_store_arguments, MAP_COLUMNS
+from fta_instrumentation import instrumented, add_profile_arguments, start_profiling, finish_profiling
+from fta_rank_stats import rank_intervals
+from fta_report import Report
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 
-def load_fta_data():
-    """Load FTA Major Safety Events data from data.transportation.gov"""
-    url = "https://data.transportation.gov/resource/9ivb-8ae9.json"
+# Socrata API endpoint for Major Safety Events dataset
+FTA_EVENTS_URL = "https://data.transportation.gov/resource/9ivb-8ae9.json"
+DEFAULT_LIMIT = 50000
+
+# Agency name patterns for New York, NYC, MTA, etc.
+NY_KEYWORDS = ['NEW YORK', 'NYC', 'MTA', 'METROPOLITAN TRANSPORTATION']
 
+# Approximate NYC bounds: (min lat, max lat, min lon, max lon)
+NYC_BOUNDS = (40.4, 41.0, -74.3, -73.7)
+
+DEFAULT_OUTPUT = 'fta_nyc_time_slider_map.html'
+
+@instrumented()
+def load_fta_data(url=FTA_EVENTS_URL, limit=DEFAULT_LIMIT):
+    """Load FTA Major Safety Events data from data.transportation.gov"""
     try:
         logging.info("Downloading FTA Major Safety Events data...")
-        df = pd.read_json(url + "?$limit=50000")
+        df = pd.read_json(f"{url}?$limit={limit}")
         logging.info(f"Successfully loaded {len(df)} safety events")
         return df
     except Exception as e:
         logging.error(f"Failed to load data: {e}")
         return None
 
-def filter_new_york_data(df):
+@instrumented()
+def filter_new_york_data(df, keywords=NY_KEYWORDS):
     """Filter data for New York transit agencies"""
     logging.info("Filtering for New York transit agencies...")
 
     # Filter by agency names containing New York, NYC, MTA, etc.
-    ny_keywords = ['NEW YORK', 'NYC', 'MTA', 'METROPOLITAN TRANSPORTATION']
-    ny_data = df[df['agency'].str.upper().str.contains('|'.join(ny_keywords), na=False)]
+    ny_data = df[df['agency'].str.upper().str.contains('|'.join(keywords), na=False)]
 
     logging.info(f"Found {len(ny_data)} incidents in New York")
     return ny_data
 
-def prepare_fatal_events(df):
+@instrumented()
+def prepare_fatal_events(df, bounds=NYC_BOUNDS):
     """Extract events with fatalities and valid coordinates"""
     logging.info("Filtering for fatal events with location data...")
 
@@ -57,20 +72,22 @@ def prepare_fatal_events(df):
     fatal_df['incident_date'] = pd.to_datetime(fatal_df['incident_date'], errors='coerce')
 
     # Remove any invalid coordinates and filter to NYC area (approximate bounds)
+    lat_min, lat_max, lon_min, lon_max = bounds
     fatal_df = fatal_df[
         (fatal_df['latitude'].notna()) &
         (fatal_df['longitude'].notna()) &
         (fatal_df['incident_date'].notna()) &
-        (fatal_df['latitude'] >= 40.4) &
-        (fatal_df['latitude'] <= 41.0) &
-        (fatal_df['longitude'] >= -74.3) &
-        (fatal_df['longitude'] <= -73.7)
+        (fatal_df['latitude'] >= lat_min) &
+        (fatal_df['latitude'] <= lat_max) &
+        (fatal_df['longitude'] >= lon_min) &
+        (fatal_df['longitude'] <= lon_max)
     ]
 
     logging.info(f"Found {len(fatal_df)} fatal incidents with valid NYC coordinates and dates")
 
     return fatal_df
 
+@instrumented()
 def create_time_slider_map(df):
     """Create an interactive map with time slider"""
 
@@ -78,6 +95,10 @@ def create_time_slider_map(df):
         logging.warning("No fatal events with coordinates found")
         return None
 
+    # folium is only needed when a map is actually rendered
+    import folium
+    from folium.plugins import TimestampedGeoJson
+
     # Sort by date
     df = df.sort_values('incident_date')
 
@@ -322,94 +343,133 @@ def create_time_slider_map(df):
 
     return m
 
+@instrumented()
+@cached_output()
+def save_time_slider_map(df, output_file=DEFAULT_OUTPUT):
+    """Create the time slider map and save it; skipped when the events are unchanged"""
+    map_obj = create_time_slider_map(df)
+    if map_obj is None:
+        return None
+
+    map_obj.save(output_file)
+    logging.info(f"Interactive time slider map saved to: {output_file}")
+    return output_file
+
+@instrumented()
 def print_temporal_summary(df):
-    """Print temporal summary statistics"""
-    print("\n" + "="*70)
-    print("TEMPORAL ANALYSIS OF NYC FATAL TRANSIT INCIDENTS")
-    print("="*70)
+    """Print temporal summary statistics; returns the Report"""
+    report = Report("Temporal Analysis of NYC Fatal Transit Incidents")
 
+    # Work on a copy so report-only columns don't change the map's cache key
+    df = df.copy()
     df['year'] = df['incident_date'].dt.year
     df['month'] = df['incident_date'].dt.month
     df['year_month'] = df['incident_date'].dt.to_period('M')
 
-    print(f"\nTotal Fatal Incidents: {len(df)}")
-    print(f"Date Range: {df['incident_date'].min().strftime('%Y-%m-%d')} to {df['incident_date'].max().strftime('%Y-%m-%d')}")
+    report.facts('totals', {
+        'Total Fatal Incidents': len(df),
+        'Date Range': f"{df['incident_date'].min().strftime('%Y-%m-%d')} to "
+                      f"{df['incident_date'].max().strftime('%Y-%m-%d')}"})
 
-    print("\nIncidents by Year:")
-    print("-" * 70)
-    year_summary = df.groupby('year').agg({
-        'total_fatalities': 'sum',
-        'year': 'count'
-    }).rename(columns={'year': 'incidents'})
+    formats = {'total_fatalities': '%d'}
+    year_summary = df.groupby('year').agg(
+        incidents=('year', 'size'), total_fatalities=('total_fatalities', 'sum'))
+    report.table('by_year', year_summary.reset_index(), "Incidents by Year",
+                 formats={'year': '%d', **formats})
 
-    for year, row in year_summary.iterrows():
-        print(f"  {int(year)}: {int(row['incidents'])} incidents, {int(row['total_fatalities'])} deaths")
-
-    print("\nTop 10 Deadliest Months:")
-    print("-" * 70)
-    month_summary = df.groupby('year_month').agg({
-        'total_fatalities': 'sum',
-        'year_month': 'count'
-    }).rename(columns={'year_month': 'incidents'}).sort_values('total_fatalities', ascending=False)
-
-    for period, row in month_summary.head(10).iterrows():
-        print(f"  {period}: {int(row['incidents'])} incidents, {int(row['total_fatalities'])} deaths")
-
-    print("\nIncidents by Event Type:")
-    print("-" * 70)
-    event_summary = df.groupby('event_type').agg({
-        'total_fatalities': 'sum',
-        'event_type': 'count'
-    }).rename(columns={'event_type': 'incidents'}).sort_values('total_fatalities', ascending=False)
-
-    for event_type, row in event_summary.iterrows():
-        print(f"  {event_type}: {int(row['incidents'])} incidents, {int(row['total_fatalities'])} deaths")
-
-def main():
-    """Main execution function"""
+    month_summary = df.groupby('year_month').agg(
+        incidents=('year_month', 'size'), total_fatalities=('total_fatalities', 'sum')
+    )
+    # Bootstrap intervals on each month's deaths and on its rank among all months
+    ranking = rank_intervals(df, 'year_month', top=10)
+    month_summary = month_summary.join(ranking[['lower', 'upper', 'rank_lower', 'rank_upper', 'p_top']])
+    month_summary = month_summary.sort_values('total_fatalities', ascending=False)
+    report.table('deadliest_months', month_summary.head(10).reset_index().rename(columns={
+                     'lower': 'deaths_lower', 'upper': 'deaths_upper', 'p_top': 'p_top10'}),
+                 "Top 10 Deadliest Months (95% bootstrap intervals)",
+                 formats={**formats, 'deaths_lower': '%.0f', 'deaths_upper': '%.0f', 'p_top10': '%.2f'})
+
+    event_summary = df.groupby('event_type').agg(
+        incidents=('event_type', 'size'), total_fatalities=('total_fatalities', 'sum')
+    ).sort_values('total_fatalities', ascending=False)
+    report.table('by_event_type', event_summary.reset_index(), "Incidents by Event Type",
+                 formats=formats)
+
+    report.show()
+    return report
+
+def run_pipeline(df=None, url=FTA_EVENTS_URL, limit=DEFAULT_LIMIT, keywords=NY_KEYWORDS,
+                 bounds=NYC_BOUNDS, output_file=DEFAULT_OUTPUT, store=None,
+                 refresh_store=False, report_file=None):
+    """Load, filter and analyze the data; returns True once the outputs are written"""
     logging.info("Starting FTA NYC Fatal Events Time Slider Map...")
 
-    # Load data
-    df = load_fta_data()
+    # Load data unless a caller already has it, reading only the needed rows from a store
+    if df is None and store:
+        df = load_events(store, lambda: load_fta_data(url, limit), refresh=refresh_store,
+                         columns=MAP_COLUMNS, agency_keywords=keywords, fatal_only=True,
+                         bounds=bounds)
+    elif df is None:
+        df = load_fta_data(url, limit)
     if df is None:
         logging.error("Cannot proceed without data")
-        return
+        return False
 
     # Filter for New York
-    ny_df = filter_new_york_data(df)
+    ny_df = filter_new_york_data(df, keywords)
 
     # Get fatal events with coordinates
-    fatal_df = prepare_fatal_events(ny_df)
+    fatal_df = prepare_fatal_events(ny_df, bounds)
 
     if len(fatal_df) == 0:
         logging.error("No fatal incidents with coordinates found for NYC")
-        return
+        return False
 
     # Print temporal summary
-    print_temporal_summary(fatal_df)
+    report = print_temporal_summary(fatal_df)
+    if report_file:
+        logging.info(f"Report written to {', '.join(report.write(report_file))}")
 
     # Create time slider map
     logging.info("Creating interactive time slider map...")
-    map_obj = create_time_slider_map(fatal_df)
-
-    if map_obj:
-        # Save map
-        output_file = '/Users/Joe/fta_nyc_time_slider_map.html'
-        map_obj.save(output_file)
-        logging.info(f"Interactive time slider map saved to: {output_file}")
-
-        print("\n" + "="*70)
-        print("TIME SLIDER MAP CREATED SUCCESSFULLY")
-        print("="*70)
-        print(f"\nOpen the following file in your web browser:")
-        print(f"  {output_file}")
-        print("\nMap Features:")
-        print("  • TIME SLIDER at bottom - drag to move through months/years")
-        print("  • PLAY BUTTON - auto-animate through time")
-        print("  • Click markers to see incident details")
-        print("  • Marker size represents number of fatalities")
-        print("  • Color represents event type (see legend)")
-        print("  • Switch between different basemap styles")
+    if not save_time_slider_map(fatal_df, output_file):
+        return False
+
+    print("\n" + "="*70)
+    print("TIME SLIDER MAP CREATED SUCCESSFULLY")
+    print("="*70)
+    print(f"\nOpen the following file in your web browser:")
+    print(f"  {output_file}")
+    print("\nMap Features:")
+    print("  • TIME SLIDER at bottom - drag to move through months/years")
+    print("  • PLAY BUTTON - auto-animate through time")
+    print("  • Click markers to see incident details")
+    print("  • Marker size represents number of fatalities")
+    print("  • Color represents event type (see legend)")
+    print("  • Switch between different basemap styles")
+    return True
+
+def main(argv=None):
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', default=FTA_EVENTS_URL, help='Major Safety Events API endpoint')
+    parser.add_argument('--limit', type=int, default=DEFAULT_LIMIT, help='maximum number of events to download')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='output file path')
+    parser.add_argument('--report-file', default=None,
+                        help='also write the report as Markdown, CSV and JSON (path without extension)')
+    add_store_arguments(parser)
+    add_profile_arguments(parser)
+    args = parser.parse_args(argv)
+
+    start_profiling(args)
+    try:
+        if not run_pipeline(url=args.url, limit=args.limit, store=args.store,
+                            refresh_store=args.refresh_store, output_file=args.output,
+                            report_file=args.report_file):
+            raise SystemExit(1)
+    finally:
+        log_cache_stats()
+        finish_profiling(args, 'fta_nyc_time_slider_map')
 
 if __name__ == "__main__":
     main()
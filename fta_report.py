@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+FTA Report Writer
+Collects a script's summary figures and tables once and renders them as plain text (stdout),
+Markdown (for the Pages site), CSV and JSON (for downstream tools). Tables are formatted a
+column at a time with NumPy/pandas string operations rather than row by row, and each format
+is rendered into one string and written with a single call.
+
+Example:
+    report = Report("NYC Fatal Transit Incidents Summary")
+    report.facts('totals', {'Total Fatal Incidents': len(df)})
+    report.table('by_year', year_summary, "By Year", formats={'total_fatalities': '%d'})
+    report.show()
+    report.write('reports/fta_nyc_fatal_incidents')
+"""
+
+import json
+import os
+import sys
+
+import numpy as np
+
+FORMATS = ('md', 'csv', 'json')
+RULE_WIDTH = 70
+MAX_CELL_WIDTH = 40
+
+def report_paths(base, formats=FORMATS):
+    """Files Report.write(base, formats) creates"""
+    return [f"{base}.{fmt}" for fmt in formats]
+
+def _format_column(series, fmt=None, max_width=MAX_CELL_WIDTH):
+    """Cells of one column as an object array of strings; missing values are blank
+
+    `fmt` is a printf format for numbers (e.g. '%.3f', '%d') or a strftime format for dates.
+    """
+    import pandas as pd
+
+    if fmt and '%Y' in fmt:
+        series = pd.to_datetime(series, errors='coerce')
+    missing = series.isna().to_numpy()
+    if fmt is None:
+        text = series.astype(str).to_numpy(dtype=object)
+    elif pd.api.types.is_datetime64_any_dtype(series):
+        text = series.dt.strftime(fmt).to_numpy(dtype=object)
+    else:
+        values = series.to_numpy(dtype=float, na_value=0)
+        values = values.astype(np.int64) if fmt.endswith('d') else values
+        text = np.char.mod(fmt, values).astype(object)
+    text[missing] = ''
+    if max_width:
+        text = pd.Series(text, dtype=object).str.slice(0, max_width).to_numpy(dtype=object)
+    return text
+
+def _format_frame(frame, formats=None):
+    """{column: formatted cells} for every column of a table"""
+    formats = formats or {}
+    return {str(col): _format_column(frame[col], formats.get(col)) for col in frame.columns}
+
+def _join_cells(cells, sep):
+    """Join formatted columns row-wise into one line per row"""
+    import pandas as pd
+
+    columns = [pd.Series(values, dtype=object) for values in cells]
+    if not columns:
+        return []
+    return columns[0].str.cat(columns[1:], sep=sep).tolist() if len(columns) > 1 \
+        else columns[0].tolist()
+
+def _jsonable(frame):
+    """Table with dates and periods as ISO strings, ready for JSON"""
+    import pandas as pd
+
+    frame = frame.copy()
+    for col in frame.columns:
+        if isinstance(frame[col].dtype, pd.PeriodDtype):
+            frame[col] = frame[col].astype(str)
+    return json.loads(frame.to_json(orient='records', date_format='iso'))
+
+class Report:
+    """Ordered sections (key figures and tables) rendered to several formats"""
+
+    def __init__(self, title):
+        self.title = title
+        self.sections = []
+
+    def facts(self, name, values, title=None):
+        """Key figures, e.g. {'Total Fatalities': 42}"""
+        self.sections.append({'kind': 'facts', 'name': name, 'title': title, 'values': dict(values)})
+        return self
+
+    def table(self, name, frame, title=None, formats=None, empty_message=None):
+        """A table; `formats` maps columns to printf/strftime formats"""
+        self.sections.append({'kind': 'table', 'name': name, 'title': title, 'frame': frame,
+                              'formats': formats, 'empty': empty_message})
+        return self
+
+    def render_text(self):
+        """Plain text in the scripts' banner style"""
+        lines = ['', '=' * RULE_WIDTH, self.title.upper(), '=' * RULE_WIDTH]
+        for section in self.sections:
+            lines += ['', f"{section['title']}:", '-' * RULE_WIDTH] if section['title'] else ['']
+            if section['kind'] == 'facts':
+                lines += [f"{label}: {value}" for label, value in section['values'].items()]
+            elif len(section['frame']) == 0:
+                lines.append(section['empty'] or '(none)')
+            else:
+                cells = _format_frame(section['frame'], section['formats'])
+                widths = {col: max(len(col), max(map(len, values))) for col, values in cells.items()}
+                lines.append('  '.join(col.ljust(widths[col]) for col in cells).rstrip())
+                padded = [np.char.ljust(values.astype(str), widths[col]) for col, values in cells.items()]
+                lines += [line.rstrip() for line in _join_cells(padded, '  ')]
+        return '\n'.join(lines) + '\n'
+
+    def render_markdown(self):
+        """Markdown with a level-2 heading per section"""
+        lines = [f"# {self.title}", '']
+        for section in self.sections:
+            if section['title']:
+                lines += [f"## {section['title']}", '']
+            if section['kind'] == 'facts':
+                lines += [f"- **{label}:** {value}" for label, value in section['values'].items()]
+            elif len(section['frame']) == 0:
+                lines.append(f"_{section['empty'] or 'None'}_")
+            else:
+                cells = _format_frame(section['frame'], section['formats'])
+                escaped = [np.char.replace(values.astype(str), '|', '\\|') for values in cells.values()]
+                lines.append('| ' + ' | '.join(cells) + ' |')
+                lines.append('|' + '---|' * len(cells))
+                lines += [f"| {line} |" for line in _join_cells(escaped, ' | ')]
+            lines.append('')
+        return '\n'.join(lines)
+
+    def render_csv(self):
+        """All tables stacked in one CSV with a leading 'table' column (figures as label/value)"""
+        import pandas as pd
+
+        frames, names = [], []
+        for section in self.sections:
+            frame = section['frame'] if section['kind'] == 'table' else \
+                pd.DataFrame({'label': list(section['values']), 'value': list(section['values'].values())})
+            # Nullable dtypes keep integer columns integral where other tables leave gaps
+            frames.append(frame.reset_index(drop=True).convert_dtypes())
+            names.append(section['name'])
+        if not frames:
+            return ''
+        stacked = pd.concat(frames, keys=names, names=['table', None]).reset_index(level=0)
+        return stacked.to_csv(index=False)
+
+    def render_json(self):
+        """{'title', 'sections': [{'name', 'title', 'values' | 'rows'}]}"""
+        sections = []
+        for section in self.sections:
+            entry = {'name': section['name'], 'title': section['title']}
+            if section['kind'] == 'facts':
+                entry['values'] = json.loads(json.dumps(section['values'], default=str))
+            else:
+                entry['rows'] = _jsonable(section['frame'])
+            sections.append(entry)
+        return json.dumps({'title': self.title, 'sections': sections}, indent=1) + '\n'
+
+    def show(self, stream=None):
+        """Write the text rendering to stdout in one call"""
+        (stream or sys.stdout).write(self.render_text())
+
+    def write(self, base, formats=FORMATS):
+        """Write base.md / base.csv / base.json; returns the paths written"""
+        renderers = {'md': self.render_markdown, 'csv': self.render_csv, 'json': self.render_json,
+                     'txt': self.render_text}
+        os.makedirs(os.path.dirname(base) or '.', exist_ok=True)
+        paths = report_paths(base, formats)
+        for fmt, path in zip(formats, paths):
+            with open(path, 'w', newline='') as f:
+                f.write(renderers[fmt]())
+        return paths
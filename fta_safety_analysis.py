@@ -6,26 +6,35 @@ Analyzes transit safety incidents from the Federal Transit Administration's open
 
 import pandas as pd
 import logging
-from collections import Counter
+import argparse
+
+from fta_event_store import load_events, add_store_arguments
+from fta_instrumentation import instrumented, add_profile_arguments, start_profiling, finish_profiling
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 
-def load_fta_data():
-    """Load FTA Major Safety Events data from data.transportation.gov"""
-    # Socrata API endpoint for Major Safety Events dataset
-    url = "https://data.transportation.gov/resource/9ivb-8ae9.json"
+# Socrata API endpoint for Major Safety Events dataset
+FTA_EVENTS_URL = "https://data.transportation.gov/resource/9ivb-8ae9.json"
+DEFAULT_LIMIT = 50000
+
+# Agency name patterns for New York, NYC, MTA, etc.
+NY_KEYWORDS = ['NEW YORK', 'NYC', 'MTA', 'METROPOLITAN TRANSPORTATION']
 
+@instrumented()
+def load_fta_data(url=FTA_EVENTS_URL, limit=DEFAULT_LIMIT):
+    """Load FTA Major Safety Events data from data.transportation.gov"""
     try:
         # Load data with a reasonable limit (increase if needed)
         logging.info("Downloading FTA Major Safety Events data...")
-        df = pd.read_json(url + "?$limit=50000")
+        df = pd.read_json(f"{url}?$limit={limit}")
         logging.info(f"Successfully loaded {len(df)} safety events")
         return df
     except Exception as e:
         logging.error(f"Failed to load data: {e}")
         return None
 
+@instrumented()
 def explore_dataset(df):
     """Explore the dataset structure"""
     print("\n" + "="*70)
@@ -39,7 +48,8 @@ def explore_dataset(df):
     print(f"\nMissing values:")
     print(df.isnull().sum())
 
-def filter_new_york_data(df):
+@instrumented()
+def filter_new_york_data(df, keywords=NY_KEYWORDS):
     """Filter data for New York transit agencies"""
     logging.info("Filtering for New York transit agencies...")
 
@@ -51,8 +61,7 @@ def filter_new_york_data(df):
         ny_data = df[df['state'].str.upper() == 'NY']
     elif 'agency_name' in df.columns:
         # Filter by agency names containing New York, NYC, MTA, etc.
-        ny_keywords = ['NEW YORK', 'NYC', 'MTA', 'METROPOLITAN TRANSPORTATION']
-        ny_data = df[df['agency_name'].str.upper().str.contains('|'.join(ny_keywords), na=False)]
+        ny_data = df[df['agency_name'].str.upper().str.contains('|'.join(keywords), na=False)]
     else:
         # Try to find any relevant location field
         location_cols = [col for col in df.columns if 'location' in col.lower() or
@@ -70,6 +79,7 @@ def filter_new_york_data(df):
     logging.info(f"Found {len(ny_data)} incidents in New York")
     return ny_data
 
+@instrumented()
 def analyze_locations(df):
     """Analyze incident locations"""
     print("\n" + "="*70)
@@ -101,6 +111,7 @@ def analyze_locations(df):
     if coord_cols:
         print(f"\nCoordinate fields found: {coord_cols}")
 
+@instrumented()
 def analyze_incident_types(df):
     """Analyze types of safety incidents"""
     print("\n" + "="*70)
@@ -117,6 +128,7 @@ def analyze_incident_types(df):
             type_counts = df[col].value_counts().head(15)
             print(type_counts)
 
+@instrumented()
 def analyze_temporal_trends(df):
     """Analyze trends over time"""
     print("\n" + "="*70)
@@ -139,26 +151,41 @@ def analyze_temporal_trends(df):
             except:
                 print(f"Could not parse {col} as date")
 
-def main():
-    """Main execution function"""
+    # Monthly per-agency counts against their rolling baseline and control limits
+    if {'agency', 'incident_date'} <= set(df.columns):
+        from fta_trends import monthly_trends
+
+        trends = monthly_trends(df, level='agency')
+        flagged = trends[trends['flagged']]
+        print(f"\n--- Agency-Months Above Control Limits ({len(flagged)}) ---")
+        if len(flagged):
+            print(flagged[['series', 'month', 'incidents', 'rolling_mean', 'yoy_change',
+                           'poisson_p']].tail(15).to_string(index=False))
+
+def run_pipeline(df=None, url=FTA_EVENTS_URL, limit=DEFAULT_LIMIT, keywords=NY_KEYWORDS,
+                 store=None, refresh_store=False):
+    """Load, filter and analyze the data; returns True if New York events were analyzed"""
     logging.info("Starting FTA Safety Events Analysis for New York...")
 
-    # Load data
-    df = load_fta_data()
+    # Load data unless a caller already has it, reading only the needed rows from a store
+    if df is None and store:
+        df = load_events(store, lambda: load_fta_data(url, limit), refresh=refresh_store)
+    elif df is None:
+        df = load_fta_data(url, limit)
     if df is None:
         logging.error("Cannot proceed without data")
-        return
+        return False
 
     # Explore the full dataset first
     explore_dataset(df)
 
     # Filter for New York
-    ny_df = filter_new_york_data(df)
+    ny_df = filter_new_york_data(df, keywords)
 
     if len(ny_df) == 0:
         logging.warning("No New York data found. Showing guidance for manual filtering.")
         print("\nPlease review the dataset columns above and filter manually.")
-        return
+        return False
 
     # Analyze New York data
     analyze_locations(ny_df)
@@ -169,6 +196,24 @@ def main():
     print("ANALYSIS COMPLETE")
     print("="*70)
     print(f"\nTotal incidents analyzed: {len(ny_df)}")
+    return True
+
+def main(argv=None):
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', default=FTA_EVENTS_URL, help='Major Safety Events API endpoint')
+    parser.add_argument('--limit', type=int, default=DEFAULT_LIMIT, help='maximum number of events to download')
+    add_store_arguments(parser)
+    add_profile_arguments(parser)
+    args = parser.parse_args(argv)
+
+    start_profiling(args)
+    try:
+        if not run_pipeline(url=args.url, limit=args.limit, store=args.store,
+                            refresh_store=args.refresh_store):
+            raise SystemExit(1)
+    finally:
+        finish_profiling(args, 'fta_safety_analysis')
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+FTA Script Startup Benchmark
+Measures import time of each FTA module with `python -X importtime` and reports the heaviest imports
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+MODULES = [
+    'fta_safety_analysis',
+    'fta_deadly_events_map',
+    'fta_nyc_basemap',
+    'fta_nyc_time_slider_map',
+    'fta_cli',
+]
+
+# Packages that must not load at import time; the stages that need them import them
+LAZY_PACKAGES = ['matplotlib', 'folium']
+
+def measure_import(module, repeat=3):
+    """Best-of-N import profile: (total seconds, {imported package: cumulative seconds})"""
+    best_total, best_imports = None, None
+    here = os.path.dirname(os.path.abspath(__file__))
+
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                                cwd=here, capture_output=True, text=True, check=True)
+
+        # Lines look like: "import time:  self [us] | cumulative | imported package"
+        imports = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            _, cumulative, name = line[len('import time:'):].split('|')
+            imports[name.strip()] = int(cumulative) / 1e6
+
+        total = imports.get(module, 0.0)
+        if best_total is None or total < best_total:
+            best_total, best_imports = total, imports
+
+    return best_total, best_imports
+
+def main(argv=None):
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('modules', nargs='*', default=MODULES, help='modules to measure')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per module (best is kept)')
+    parser.add_argument('--top', type=int, default=5, help='heaviest top-level imports to show')
+    parser.add_argument('--max-seconds', type=float, default=None,
+                        help='exit non-zero if any module takes longer than this to import')
+    args = parser.parse_args(argv)
+
+    failures = []
+    print(f"{'Module':<28} {'Import s':>9}  Heaviest top-level imports")
+    print("-" * 90)
+    for module in args.modules:
+        total, imports = measure_import(module, args.repeat)
+
+        # Only top-level packages (no dots), excluding the module itself
+        heaviest = sorted(((s, name) for name, s in imports.items()
+                           if '.' not in name and name != module), reverse=True)[:args.top]
+        print(f"{module:<28} {total:>9.3f}  " +
+              ', '.join(f"{name} {s:.2f}s" for s, name in heaviest))
+
+        eager = [pkg for pkg in LAZY_PACKAGES if pkg in imports]
+        if eager:
+            failures.append(f"{module} imports {', '.join(eager)} at startup")
+        if args.max_seconds is not None and total > args.max_seconds:
+            failures.append(f"{module} took {total:.3f}s to import (limit {args.max_seconds}s)")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+FTA Monthly Incident Trends
+Maintains monthly incident and fatality counts per (agency, event type) as one series x month
+matrix, updated incrementally as new events arrive. Events are identified by agency, event type,
+incident time and source id (when present), normalized alike for store reads and downloads, so
+re-reading events never counts them twice and a revised fatality count replaces the old one.
+Agency, event-type and overall series are sums of its rows.
+
+Rolling means, year-over-year change and control-limit flags are computed for every series at
+once with array operations along the month axis:
+  * Poisson: P(X >= count) under the trailing mean of the previous ROLLING_MONTHS months
+  * EWMA: exponentially weighted mean against Poisson-sigma limits around that trailing mean
+Both start once a full ROLLING_MONTHS of history exists and use no later months.
+
+Example:
+    python fta_trends.py --store fta_events.sqlite --level agency --flagged
+"""
+
+import argparse
+import json
+import logging
+import os
+
+import numpy as np
+
+DEFAULT_STATE = 'fta_trends.npz'
+SERIES_KEYS = ['agency', 'event_type']
+# Source event id columns; the first present becomes part of each event's identity
+SOURCE_ID_COLUMNS = ['event_id', 'incident_number', 'id']
+LEVELS = ['agency', 'event_type', 'total']
+
+ROLLING_MONTHS = 12
+EWMA_LAMBDA = 0.3
+CONTROL_SIGMA = 3.0
+POISSON_ALPHA = 0.01
+# Minimum events per window assumed by the tests
+BASELINE_FLOOR = 1.0
+
+def _month_number(dates):
+    """Months since year 0 (year * 12 + month - 1) for a datetime Series"""
+    return (dates.dt.year * 12 + dates.dt.month - 1).to_numpy(dtype=np.int64)
+
+def event_keys(df, events):
+    """Identity hash per event from its normalized agency, event type, incident time and source id
+
+    Events sharing all of these are numbered in order, so distinct same-time events stay distinct.
+    """
+    import pandas as pd
+
+    identity = pd.DataFrame({
+        'agency': events['agency'],
+        'event_type': events['event_type'],
+        'incident_date': events['incident_date'].dt.strftime('%Y-%m-%dT%H:%M:%S'),
+    })
+    source = next((col for col in SOURCE_ID_COLUMNS if col in df.columns), None)
+    if source:
+        identity[source] = df.loc[events.index, source].astype(str)
+    identity['occurrence'] = identity.groupby(list(identity.columns), sort=False).cumcount()
+    return pd.util.hash_pandas_object(identity, index=False).to_numpy()
+
+class MonthlySeries:
+    """Monthly counts per (agency, event type), grown in place as events arrive"""
+
+    def __init__(self):
+        import pandas as pd
+
+        self.keys = pd.MultiIndex.from_tuples([], names=SERIES_KEYS)
+        self.first_month = None
+        self.incidents = np.zeros((0, 0), dtype=np.int64)
+        self.fatalities = np.zeros((0, 0))
+        # Sorted identity hashes of counted events and the fatalities each last reported
+        self.seen = np.zeros(0, dtype=np.uint64)
+        self.seen_fatalities = np.zeros(0)
+
+    @property
+    def months(self):
+        """Month periods covered by the columns"""
+        import pandas as pd
+
+        if self.first_month is None:
+            return pd.PeriodIndex([], freq='M')
+        start = pd.Period(year=self.first_month // 12, month=self.first_month % 12 + 1, freq='M')
+        return pd.period_range(start, periods=self.incidents.shape[1], freq='M')
+
+    def update(self, df):
+        """Add new events and apply fatality revisions; returns the number of events changed"""
+        import pandas as pd
+
+        events = pd.DataFrame({
+            'agency': df['agency'].fillna('Unknown').astype(str),
+            'event_type': (df['event_type'] if 'event_type' in df.columns
+                           else pd.Series('Unknown', index=df.index)).fillna('Unknown').astype(str),
+            'incident_date': pd.to_datetime(df['incident_date'], errors='coerce'),
+            'total_fatalities': pd.to_numeric(df.get('total_fatalities', 0), errors='coerce'),
+        }).dropna(subset=['incident_date'])
+        reported = events['total_fatalities'].fillna(0).to_numpy(dtype=float)
+
+        # Counted events only contribute the change in their fatalities
+        hashes = event_keys(df, events)
+        pos = np.searchsorted(self.seen, hashes)
+        known = np.zeros(len(hashes), dtype=bool)
+        inside = pos < len(self.seen)
+        known[inside] = self.seen[pos[inside]] == hashes[inside]
+        previous = np.zeros(len(hashes))
+        previous[known] = self.seen_fatalities[pos[known]]
+
+        events['incidents'] = (~known).astype(np.int64)
+        events['fatalities'] = reported - previous
+        changed = ~known | (reported != previous)
+        events = events[changed]
+        if len(events) == 0:
+            return 0
+
+        events['month'] = _month_number(events['incident_date'])
+        grouped = events.groupby(SERIES_KEYS + ['month'])[['incidents', 'fatalities']].sum()
+
+        # Grow the matrices to cover any new series and months, then add the new counts
+        keys = self.keys.union(grouped.index.droplevel('month').unique())
+        months = grouped.index.get_level_values('month')
+        first = months.min() if self.first_month is None else min(self.first_month, months.min())
+        last = months.max() if self.first_month is None else \
+            max(self.first_month + self.incidents.shape[1] - 1, months.max())
+
+        incidents = np.zeros((len(keys), last - first + 1), dtype=np.int64)
+        fatalities = np.zeros(incidents.shape)
+        if len(self.keys):
+            rows = keys.get_indexer(self.keys)
+            offset = self.first_month - first
+            incidents[rows, offset:offset + self.incidents.shape[1]] = self.incidents
+            fatalities[rows, offset:offset + self.fatalities.shape[1]] = self.fatalities
+
+        rows = keys.get_indexer(grouped.index.droplevel('month'))
+        np.add.at(incidents, (rows, months - first), grouped['incidents'].to_numpy())
+        np.add.at(fatalities, (rows, months - first), grouped['fatalities'].to_numpy())
+
+        self.keys, self.first_month = keys, int(first)
+        self.incidents, self.fatalities = incidents, fatalities
+        seen_fatalities = self.seen_fatalities.copy()
+        seen_fatalities[pos[known]] = reported[known]
+        seen = np.concatenate([self.seen, hashes[~known]])
+        order = np.argsort(seen, kind='stable')
+        self.seen = seen[order]
+        self.seen_fatalities = np.concatenate([seen_fatalities, reported[~known]])[order]
+        revised = int((known & changed).sum())
+        logging.info(f"Trend series updated with {len(events) - revised} new and {revised} revised "
+                     f"events ({len(keys)} series x {incidents.shape[1]} months)")
+        return len(events)
+
+    def aggregate(self, level):
+        """(keys, incidents, fatalities) summed to 'agency', 'event_type' or 'total'"""
+        import pandas as pd
+
+        if level == 'total':
+            return (pd.Index(['All agencies']), self.incidents.sum(axis=0, keepdims=True),
+                    self.fatalities.sum(axis=0, keepdims=True))
+        codes, keys = pd.factorize(self.keys.get_level_values(level), sort=True)
+        incidents = np.zeros((len(keys), self.incidents.shape[1]), dtype=np.int64)
+        fatalities = np.zeros(incidents.shape)
+        np.add.at(incidents, codes, self.incidents)
+        np.add.at(fatalities, codes, self.fatalities)
+        return pd.Index(keys, name=level), incidents, fatalities
+
+    def statistics(self, level='agency', **options):
+        """Long table of monthly counts, rolling/YoY statistics and control flags per series"""
+        import pandas as pd
+
+        keys, incidents, fatalities = self.aggregate(level)
+        stats = trend_statistics(incidents, **options)
+        n_series, n_months = incidents.shape
+        table = pd.DataFrame({
+            'series': np.repeat(np.asarray(keys, dtype=object), n_months),
+            'month': np.tile(self.months, n_series),
+            'incidents': incidents.ravel(),
+            'fatalities': fatalities.ravel(),
+            **{name: values.ravel() for name, values in stats.items()},
+        })
+        table.insert(0, 'level', level)
+        return table
+
+    def save(self, path=DEFAULT_STATE):
+        """Persist counts and the identity and fatalities of every counted event"""
+        np.savez_compressed(path, incidents=self.incidents, fatalities=self.fatalities,
+                            seen=self.seen, seen_fatalities=self.seen_fatalities, first_month=-1 if self.first_month is None else self.first_month,
+                            keys=json.dumps(list(self.keys)))
+
+    @classmethod
+    def load(cls, path=DEFAULT_STATE):
+        """Load saved state, or start empty if there is none"""
+        import pandas as pd
+
+        series = cls()
+        if not os.path.exists(path):
+            return series
+        with np.load(path) as f:
+            if 'seen_fatalities' not in f:
+                logging.warning(f"{path} predates per-event identities; rebuilding the series")
+                return series
+            keys = [tuple(k) for k in json.loads(str(f['keys']))]
+            series.keys = pd.MultiIndex.from_tuples(keys, names=SERIES_KEYS) if keys else series.keys
+            series.incidents, series.fatalities, series.seen = f['incidents'], f['fatalities'], f['seen']
+            series.seen_fatalities = f['seen_fatalities']
+            series.first_month = None if int(f['first_month']) < 0 else int(f['first_month'])
+        return series
+
+def trend_statistics(counts, window=ROLLING_MONTHS, ewma_lambda=EWMA_LAMBDA,
+                     sigma=CONTROL_SIGMA, alpha=POISSON_ALPHA):
+    """Per-month statistics for a (series x months) count matrix, all series at once"""
+    from scipy.signal import lfilter
+    from scipy.stats import poisson
+
+    counts = np.asarray(counts, dtype=float)
+    n_months = counts.shape[1]
+    t = np.arange(n_months)
+    cumulative = np.concatenate([np.zeros((counts.shape[0], 1)), np.cumsum(counts, axis=1)], axis=1)
+
+    # Trailing mean including the current month, and baseline of the months before it
+    lo = np.maximum(t + 1 - window, 0)
+    rolling_mean = (cumulative[:, t + 1] - cumulative[:, lo]) / (t + 1 - lo)
+    prev_lo = np.maximum(t - window, 0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        baseline = (cumulative[:, t] - cumulative[:, prev_lo]) / (t - prev_lo)
+    # Only test months with a full window of history, and never against a rate below one
+    # event per window (an empty window would otherwise make any single event "significant")
+    baseline[:, t < window] = np.nan
+    rate = np.maximum(baseline, BASELINE_FLOOR / window)
+
+    previous_year = np.full(counts.shape, np.nan)
+    previous_year[:, 12:] = counts[:, :-12]
+    yoy_change = counts - previous_year
+    with np.errstate(invalid='ignore', divide='ignore'):
+        yoy_pct = np.where(previous_year > 0, 100 * yoy_change / previous_year, np.nan)
+
+    # Poisson test of each month against its trailing baseline
+    tested = ~np.isnan(baseline)
+    poisson_p = np.full(counts.shape, np.nan)
+    poisson_p[tested] = poisson.sf(counts[tested] - 1, rate[tested])
+
+    # EWMA (started at the first month) against limits around the trailing baseline, so each
+    # month's limit only uses earlier months; Poisson sigma of sqrt(baseline)
+    ewma = lfilter([ewma_lambda], [1, ewma_lambda - 1], counts, axis=1,
+                   zi=(1 - ewma_lambda) * counts[:, :1])[0] if n_months else counts.copy()
+    ewma_ucl = rate + sigma * np.sqrt(rate * ewma_lambda / (2 - ewma_lambda))
+
+    with np.errstate(invalid='ignore'):
+        flagged = (poisson_p < alpha) | ((ewma > ewma_ucl) & (counts > rate))
+    return {'rolling_mean': rolling_mean, 'yoy_change': yoy_change, 'yoy_pct': yoy_pct,
+            'poisson_p': poisson_p, 'ewma': ewma, 'ewma_ucl': ewma_ucl, 'flagged': flagged}
+
+def monthly_trends(df, level='agency', **options):
+    """One-shot statistics table for a frame of events (no saved state)"""
+    series = MonthlySeries()
+    series.update(df)
+    return series.statistics(level, **options)
+
+def main(argv=None):
+    """Update the saved monthly series with new events and report trend flags"""
+    from fta_event_store import add_store_arguments, load_events
+    from fta_safety_analysis import DEFAULT_LIMIT, FTA_EVENTS_URL, load_fta_data
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--url', default=FTA_EVENTS_URL, help='Major Safety Events API endpoint')
+    parser.add_argument('--limit', type=int, default=DEFAULT_LIMIT, help='maximum number of events to download')
+    parser.add_argument('--state', default=DEFAULT_STATE, help='saved series state (npz)')
+    parser.add_argument('--level', choices=LEVELS, default='agency')
+    parser.add_argument('--flagged', action='store_true', help='only show flagged months')
+    parser.add_argument('--months', type=int, default=24, help='most recent months to show')
+    parser.add_argument('--output', default=None, help='save the full statistics table as CSV')
+    add_store_arguments(parser)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    columns = ['agency', 'event_type', 'incident_date', 'total_fatalities'] + SOURCE_ID_COLUMNS
+    download = lambda: load_fta_data(args.url, args.limit)
+    df = load_events(args.store, download, args.refresh_store, columns=columns) if args.store else download()
+    if df is None:
+        logging.error("Cannot proceed without data")
+        return
+
+    series = MonthlySeries.load(args.state)
+    if series.update(df):
+        series.save(args.state)
+
+    table = series.statistics(args.level)
+    if args.output:
+        table.to_csv(args.output, index=False)
+        logging.info(f"Statistics saved to {args.output}")
+
+    recent = table[table['month'] >= series.months[-min(args.months, len(series.months))]]
+    if args.flagged:
+        recent = recent[recent['flagged']]
+    print(recent.sort_values(['month', 'incidents'], ascending=[True, False]).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Netflix Movie x Reviewer Features
+Builds the sparse movie x reviewer rating matrix straight from (movie_id, user_id, rating)
+triples, replacing groupBy("movie_id").pivot("user_id").avg("rating").fillna(0), which
+materializes a dense row per movie and needs spark.sql.pivotMaxValues raised. Only ratings that
+exist are stored, so the reviewer count can grow to tens of thousands on one machine.
+
+Locally the matrix is a SciPy CSR matrix; spark_sparse_features gives the same rows as a
+(movie_id, features) Spark DataFrame of SparseVectors for the pyspark.ml pipeline.
+
+Example:
+    python netflix_features.py netflix_ratings --reviewers 20000 --output ratings.npz
+"""
+
+import argparse
+import logging
+import os
+
+import numpy as np
+import scipy.sparse as sp
+
+TRIPLE_COLUMNS = ['movie_id', 'user_id', 'rating']
+
+def _as_chunks(triples):
+    """A DataFrame of triples, or an iterable of DataFrame chunks, as an iterable of chunks"""
+    import pandas as pd
+
+    return [triples] if isinstance(triples, pd.DataFrame) else triples
+
+def build_rating_matrix(triples, reviewers=None, movies=None):
+    """Sparse (movies x reviewers) CSR matrix of mean ratings from (movie_id, user_id, rating)
+
+    `triples` is a DataFrame or an iterable of chunks (e.g. pd.read_csv(..., chunksize=...)).
+    `reviewers` / `movies` restrict (and order) the columns / rows; by default every id seen is
+    used, in ascending order. Returns (matrix, movie_ids, reviewer_ids).
+    Repeated (movie, reviewer) pairs are averaged, as in the pivot's avg("rating").
+    """
+    keep_users = None if reviewers is None else np.asarray(reviewers)
+    keep_movies = None if movies is None else np.asarray(movies)
+
+    movie_parts, user_parts, rating_parts = [], [], []
+    n_rows = 0
+    for chunk in _as_chunks(triples):
+        m = chunk['movie_id'].to_numpy()
+        u = chunk['user_id'].to_numpy()
+        r = chunk['rating'].to_numpy(dtype=np.float32)
+        n_rows += len(chunk)
+        mask = np.ones(len(chunk), dtype=bool)
+        if keep_users is not None:
+            mask &= np.isin(u, keep_users)
+        if keep_movies is not None:
+            mask &= np.isin(m, keep_movies)
+        movie_parts.append(m[mask].astype(np.int64))
+        user_parts.append(u[mask].astype(np.int64))
+        rating_parts.append(r[mask])
+
+    movie_col = np.concatenate(movie_parts) if movie_parts else np.zeros(0, dtype=np.int64)
+    user_col = np.concatenate(user_parts) if user_parts else np.zeros(0, dtype=np.int64)
+    ratings = np.concatenate(rating_parts) if rating_parts else np.zeros(0, dtype=np.float32)
+
+    movie_ids = np.unique(movie_col) if keep_movies is None else np.sort(keep_movies)
+    reviewer_ids = np.unique(user_col) if keep_users is None else np.sort(keep_users)
+    rows = np.searchsorted(movie_ids, movie_col)
+    cols = np.searchsorted(reviewer_ids, user_col)
+
+    shape = (len(movie_ids), len(reviewer_ids))
+    sums = sp.csr_matrix((ratings, (rows, cols)), shape=shape, dtype=np.float32)
+    counts = sp.csr_matrix((np.ones(len(ratings), dtype=np.float32), (rows, cols)), shape=shape)
+    sums.sum_duplicates()
+    counts.sum_duplicates()
+    # Both matrices have the same sparsity pattern in canonical order, so data lines up
+    sums.data /= counts.data
+
+    density = sums.nnz / max(shape[0] * shape[1], 1)
+    logging.info(f"Rating matrix {shape[0]} movies x {shape[1]} reviewers from {n_rows} ratings: "
+                 f"{sums.nnz} stored ({density:.2%} dense, "
+                 f"{(sums.data.nbytes + sums.indices.nbytes + sums.indptr.nbytes) / 1024**2:.1f} MB "
+                 f"vs {shape[0] * shape[1] * 8 / 1024**2:.1f} MB dense)")
+    return sums, movie_ids, reviewer_ids
+
+def save_rating_matrix(path, matrix, movie_ids, reviewer_ids):
+    """Save the matrix with its row/column ids (npz)"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    np.savez_compressed(path, data=matrix.data, indices=matrix.indices, indptr=matrix.indptr,
+                        shape=matrix.shape, movie_ids=movie_ids, reviewer_ids=reviewer_ids)
+
+def load_rating_matrix(path):
+    """Load (matrix, movie_ids, reviewer_ids) written by save_rating_matrix"""
+    with np.load(path) as f:
+        matrix = sp.csr_matrix((f['data'], f['indices'], f['indptr']), shape=tuple(f['shape']))
+        return matrix, f['movie_ids'], f['reviewer_ids']
+
+def spark_sparse_features(df, reviewers=None, features_col='features'):
+    """(movie_id, features) Spark DataFrame of SparseVectors over the reviewer columns
+
+    Drop-in replacement for pivot + fillna(0) + VectorAssembler. Reviewer ids (at most tens of
+    thousands) are indexed on the driver and broadcast; ratings themselves are never collected.
+    Returns (features DataFrame, reviewer_ids) where reviewer_ids[j] is vector index j.
+    """
+    from pyspark.ml.linalg import SparseVector, VectorUDT
+    from pyspark.sql import functions as F
+
+    if reviewers is None:
+        reviewers = [row[0] for row in df.select('user_id').distinct().collect()]
+    reviewer_ids = sorted(int(r) for r in reviewers)
+    n_reviewers = len(reviewer_ids)
+
+    spark = df.sql_ctx.sparkSession
+    index = spark.createDataFrame([(r, j) for j, r in enumerate(reviewer_ids)],
+                                  ['user_id', 'user_idx'])
+
+    ratings = (df.join(F.broadcast(index), on='user_id')
+               .groupBy('movie_id', 'user_idx').agg(F.avg('rating').alias('rating')))
+
+    @F.udf(VectorUDT())
+    def to_vector(entries):
+        entries = sorted(entries)
+        return SparseVector(n_reviewers, [e[0] for e in entries], [float(e[1]) for e in entries])
+
+    features = (ratings.groupBy('movie_id')
+                .agg(F.collect_list(F.struct('user_idx', 'rating')).alias('entries'))
+                .select('movie_id', to_vector('entries').alias(features_col)))
+    return features, reviewer_ids
+
+def main(argv=None):
+    """Build the sparse movie x reviewer matrix from the converted ratings"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('ratings', nargs='?', default=None,
+                        help='Parquet ratings directory from netflix_ratings.py')
+    parser.add_argument('--movies', default=None, help='movies Parquet; null movies are dropped')
+    parser.add_argument('--reviewers', type=int, default=None,
+                        help='keep only the most active N reviewers (default: all)')
+    parser.add_argument('--output', default='ratings.npz', help='npz output path')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    from netflix_ratings import (DEFAULT_MOVIES_PATH, DEFAULT_RATINGS_DIR, id_bitmap, read_movies,
+                                 reviewer_counts, scan_ratings, top_reviewers, valid_movie_bitmap)
+    ratings_dir = args.ratings or DEFAULT_RATINGS_DIR
+    movies_path = args.movies or DEFAULT_MOVIES_PATH
+    valid = valid_movie_bitmap(read_movies(movies_path)) if os.path.exists(movies_path) else None
+
+    reviewers = None
+    if args.reviewers:
+        reviewers = top_reviewers(reviewer_counts(ratings_dir, valid), args.reviewers)
+
+    chunks = scan_ratings(ratings_dir, TRIPLE_COLUMNS, valid,
+                          id_bitmap(reviewers) if reviewers is not None else None)
+    matrix, movie_ids, reviewer_ids = build_rating_matrix(chunks, reviewers)
+    save_rating_matrix(args.output, matrix, movie_ids, reviewer_ids)
+    logging.info(f"Saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
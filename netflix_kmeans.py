@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Local Mini-Batch KMeans for the Netflix Rating Matrix
+NumPy/SciPy replacement for the Spark KMeans sweeps in KMeans.ipynb (kmeans_range and
+kmeans_range_tune), working directly on the sparse movie x reviewer matrix.
+
+The sweeps reuse work instead of refitting 81 models from scratch:
+  * each k runs one trajectory and is scored at every max_iter checkpoint (1, 3, 5, ... 100),
+    so larger max_iter values continue from the smaller ones
+  * with warm_start, k starts from the k-1 solution plus one k-means++ center
+  * fits (when not warm-started) and silhouette scoring run across a process pool
+
+Silhouette defaults to Spark ClusteringEvaluator's squared-Euclidean variant, exact in O(N k d);
+cluster_eval also gives a sampled Euclidean silhouette, Davies-Bouldin and inertia per config.
+
+Example:
+    python netflix_kmeans.py ratings.npz --tune --workers 4 --output kmeans_scores.csv
+"""
+
+import argparse
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import scipy.sparse as sp
+
+from cluster_eval import evaluate, row_sq_norms
+
+SEED = 314
+BATCH_SIZE = 1024
+ITER_VALS = [1, 3, 5, 10, 20, 30, 40, 50, 100]
+
+def standardize(X):
+    """Scale columns to unit sample std, like Spark StandardScaler(withMean=False)
+
+    Centering is skipped so sparse input stays sparse; zero-variance columns become 0.
+    Returns (scaled CSR matrix, column stds).
+    """
+    X = sp.csr_matrix(X, dtype=np.float64)
+    n = X.shape[0]
+    mean = np.asarray(X.mean(axis=0)).ravel()
+    mean_sq = np.asarray(X.multiply(X).mean(axis=0)).ravel()
+    std = np.sqrt(np.maximum(mean_sq - mean**2, 0) * n / max(n - 1, 1))
+    scale = np.divide(1, std, out=np.zeros_like(std), where=std > 0)
+    return sp.csr_matrix(X @ sp.diags(scale)), std
+
+def _sq_distances(X, x_sq, centers):
+    """Squared Euclidean distances (n x k) from rows of X to dense centers"""
+    d = x_sq[:, None] - 2 * np.asarray(X @ centers.T) + np.einsum('ij,ij->i', centers, centers)
+    return np.maximum(d, 0)
+
+def kmeans_plusplus(X, k, rng, centers=None, x_sq=None):
+    """k-means++ seeding; existing `centers` are kept and only the missing ones are drawn"""
+    x_sq = row_sq_norms(X) if x_sq is None else x_sq
+    n = X.shape[0]
+    chosen = [] if centers is None else list(np.asarray(centers))
+    if not chosen:
+        chosen.append(np.asarray(X[rng.integers(n)].todense()).ravel() if sp.issparse(X)
+                      else X[rng.integers(n)].copy())
+    closest = _sq_distances(X, x_sq, np.array(chosen)).min(axis=1)
+
+    while len(chosen) < k:
+        total = closest.sum()
+        i = rng.choice(n, p=closest / total) if total > 0 else rng.integers(n)
+        center = np.asarray(X[i].todense()).ravel() if sp.issparse(X) else X[i].copy()
+        chosen.append(center)
+        closest = np.minimum(closest, _sq_distances(X, x_sq, center[None, :])[:, 0])
+    return np.array(chosen[:k])
+
+class MiniBatchKMeans:
+    """Mini-batch KMeans (Sculley 2010) on sparse rows; fit() can be called again to continue
+
+    One iteration is one shuffled pass over the data in mini-batches, so max_iter means the same
+    amount of work as in the Spark sweeps.
+    """
+
+    def __init__(self, k, batch_size=BATCH_SIZE, seed=SEED):
+        self.k = k
+        self.batch_size = batch_size
+        self.rng = np.random.default_rng(seed)
+        self.centers = None
+        self.counts = None
+        self.n_iter = 0
+
+    def init_centers(self, X, x_sq=None, warm_centers=None):
+        """k-means++ seeding, keeping any warm-start centers (e.g. the k-1 solution)"""
+        self.centers = kmeans_plusplus(X, self.k, self.rng, warm_centers, x_sq)
+        self.counts = np.zeros(self.k)
+        self.n_iter = 0
+        return self
+
+    def fit(self, X, n_iter, x_sq=None):
+        """Run n_iter more passes over X (seeding first if needed)"""
+        x_sq = row_sq_norms(X) if x_sq is None else x_sq
+        if self.centers is None:
+            self.init_centers(X, x_sq)
+
+        n = X.shape[0]
+        for _ in range(n_iter):
+            order = self.rng.permutation(n)
+            for start in range(0, n, self.batch_size):
+                rows = order[start:start + self.batch_size]
+                batch = X[rows]
+                labels = _sq_distances(batch, x_sq[rows], self.centers).argmin(axis=1)
+
+                # Per-sample learning rate 1/count, applied to the batch's cluster sums at once
+                onehot = sp.csr_matrix((np.ones(len(rows)), (labels, np.arange(len(rows)))),
+                                       shape=(self.k, len(rows)))
+                sums = np.asarray((onehot @ batch).todense()) if sp.issparse(batch) else onehot @ batch
+                batch_counts = np.bincount(labels, minlength=self.k)
+                self.counts += batch_counts
+                hit = batch_counts > 0
+                self.centers[hit] += ((sums[hit] - batch_counts[hit, None] * self.centers[hit])
+                                      / self.counts[hit, None])
+            self.n_iter += 1
+        return self
+
+    def predict(self, X, x_sq=None):
+        """Nearest-center labels"""
+        x_sq = row_sq_norms(X) if x_sq is None else x_sq
+        labels = np.empty(X.shape[0], dtype=np.int64)
+        for start in range(0, X.shape[0], 8 * self.batch_size):
+            stop = start + 8 * self.batch_size
+            labels[start:stop] = _sq_distances(X[start:stop], x_sq[start:stop], self.centers).argmin(axis=1)
+        return labels
+
+# Process-pool workers get the (large) matrix once, not with every task
+_X = _X_SQ = None
+
+def _init_worker(X, x_sq):
+    global _X, _X_SQ
+    _X, _X_SQ = X, x_sq
+
+def _fit_chain(ks, iter_vals, warm_start, seed, batch_size):
+    """Fit each k in turn, snapshotting centers at every max_iter checkpoint
+
+    With warm_start, k starts from k-1's final centers, so its snapshots also carry
+    total_iter: max_iter plus every iteration its warm-start ancestors ran.
+    """
+    snapshots, previous, ancestor_iter = [], None, 0
+    for k in ks:
+        model = MiniBatchKMeans(k, batch_size, seed)
+        model.init_centers(_X, _X_SQ, previous if warm_start else None)
+        for max_iter in iter_vals:
+            model.fit(_X, max_iter - model.n_iter, _X_SQ)
+            snapshots.append((k, max_iter, ancestor_iter + max_iter, model.centers.copy()))
+        previous = model.centers
+        ancestor_iter = ancestor_iter + model.n_iter if warm_start else 0
+    return snapshots
+
+def _score(k, max_iter, total_iter, centers, silhouette):
+    labels = _sq_distances(_X, _X_SQ, centers).argmin(axis=1)
+    return {'k': k, 'max_iter': max_iter, 'total_iter': total_iter,
+            **evaluate(_X, labels, k, centers, silhouette, _X_SQ)}
+
+def sweep(X, ks, iter_vals, warm_start=True, seed=SEED, batch_size=BATCH_SIZE, workers=None,
+          silhouette='sq_euclidean'):
+    """Scores (see cluster_eval.evaluate) for every (k, max_iter), sharing work as described above
+
+    max_iter counts the iterations run for that k only; with warm_start, total_iter also counts
+    the iterations of the k-1, k-2, ... fits it was seeded from, so compare configurations
+    across modes on total_iter. Warm-started ks form one dependent chain, so their fits run
+    serially in a single worker and only scoring is spread over the pool; without warm_start
+    every k is fitted in parallel.
+    """
+    import pandas as pd
+
+    x_sq = row_sq_norms(X)
+    iter_vals = sorted(set(iter_vals))
+    chains = [list(ks)] if warm_start else [[k] for k in ks]
+    start = time.perf_counter()
+
+    if workers == 1:
+        _init_worker(X, x_sq)
+        snapshots = [s for chain in chains for s in _fit_chain(chain, iter_vals, warm_start, seed, batch_size)]
+        fit_s = time.perf_counter() - start
+        scores = [_score(*s, silhouette) for s in snapshots]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(X, x_sq)) as pool:
+            fits = [pool.submit(_fit_chain, chain, iter_vals, warm_start, seed, batch_size)
+                    for chain in chains]
+            snapshots = [s for f in fits for s in f.result()]
+            fit_s = time.perf_counter() - start
+            scores = list(pool.map(_score, *zip(*snapshots), [silhouette] * len(snapshots)))
+
+    logging.info(f"Swept {len(scores)} (k, max_iter) configurations: fitting {fit_s:.1f}s, "
+                 f"scoring {time.perf_counter() - start - fit_s:.1f}s")
+    return pd.DataFrame(scores)
+
+def kmeans_range(lower, upper, X, max_iter=3, **kwargs):
+    """Silhouette per k in lower..upper, best first (columns k, sil_score)"""
+    scores = sweep(X, range(lower, upper + 1), [max_iter], **kwargs)
+    return scores[['k', 'sil_score']].sort_values('sil_score', ascending=False)
+
+def kmeans_range_tune(lower, upper, X, iter_vals=ITER_VALS, **kwargs):
+    """Silhouette per (max_iter, k), best first (columns max_iter, total_iter, k, sil_score)"""
+    scores = sweep(X, range(lower, upper + 1), iter_vals, **kwargs)
+    return scores[['max_iter', 'total_iter', 'k', 'sil_score']].sort_values('sil_score', ascending=False)
+
+def main(argv=None):
+    """Silhouette sweeps over k (and max_iter) on a saved rating matrix"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('matrix', help='npz from netflix_features.py')
+    parser.add_argument('--lower', type=int, default=2)
+    parser.add_argument('--upper', type=int, default=10)
+    parser.add_argument('--tune', action='store_true', help='also sweep max_iter over ITER_VALS')
+    parser.add_argument('--max-iter', type=int, default=3, help='iterations when not tuning')
+    parser.add_argument('--no-scale', action='store_true', help="cluster raw ratings")
+    parser.add_argument('--no-warm-start', action='store_true', help='seed every k from scratch')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--silhouette', default='sq_euclidean', choices=['sq_euclidean', 'exact', 'sampled'])
+    parser.add_argument('--workers', type=int, default=None, help='worker processes')
+    parser.add_argument('--output', default=None, help='save the score table as CSV')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    from netflix_features import load_rating_matrix
+    X, movie_ids, reviewer_ids = load_rating_matrix(args.matrix)
+    if not args.no_scale:
+        X, _ = standardize(X)
+
+    options = dict(warm_start=not args.no_warm_start, seed=args.seed,
+                   batch_size=args.batch_size, workers=args.workers, silhouette=args.silhouette)
+    if args.tune:
+        table = kmeans_range_tune(args.lower, args.upper, X, **options)
+    else:
+        table = kmeans_range(args.lower, args.upper, X, args.max_iter, **options)
+
+    print(table.head(10))
+    if args.output:
+        table.to_csv(args.output, index=False)
+        logging.info(f"Scores saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Netflix KMeans Scoring
+Assigns new or updated movie rating vectors to the clusters of the saved `kmeans_model`
+Spark pipeline without Spark and without refitting: the StandardScaler std/mean and the KMeans
+centers are read straight from the pipeline's Parquet files into NumPy.
+
+Centers can be updated as new ratings arrive with the (decayed) weighted-average rule of
+Spark's StreamingKMeans, starting from the training cluster sizes (save_cluster_sizes) as the
+centers' weights; updated models are saved as npz next to the Spark model.
+
+Example:
+    python netflix_kmeans_scoring.py kmeans_model ratings.npz --update --save kmeans_model.npz
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+import time
+
+import numpy as np
+import scipy.sparse as sp
+
+from cluster_eval import row_sq_norms
+
+BATCH_SIZE = 4096
+REVIEWER_IDS_FILE = 'reviewer_ids.json'
+CLUSTER_SIZES_FILE = 'cluster_sizes.json'
+
+def _read_vector(value):
+    """Spark ML vector (struct of type, size, indices, values) as a dense array"""
+    if value['type'] == 1:
+        return np.asarray(value['values'], dtype=float)
+    dense = np.zeros(value['size'])
+    dense[np.asarray(value['indices'], dtype=np.int64)] = value['values']
+    return dense
+
+def _read_stage(stage_dir):
+    """(class name, params, data rows) of one saved pipeline stage"""
+    import pyarrow.parquet as pq
+
+    with open(glob.glob(os.path.join(stage_dir, 'metadata', 'part-*'))[0]) as f:
+        metadata = json.loads(f.readline())
+    params = {**metadata.get('defaultParamMap', {}), **metadata.get('paramMap', {})}
+    files = sorted(glob.glob(os.path.join(stage_dir, 'data', '*.parquet')))
+    rows = [row for path in files for row in pq.read_table(path).to_pylist()]
+    return metadata['class'].rsplit('.', 1)[-1], params, rows
+
+def save_reviewer_ids(model_dir, reviewer_ids):
+    """Record which reviewer each feature index is, so raw ratings can be scored later"""
+    with open(os.path.join(model_dir, REVIEWER_IDS_FILE), 'w') as f:
+        json.dump([int(r) for r in reviewer_ids], f)
+
+def save_cluster_sizes(model_dir, cluster_sizes):
+    """Record the training cluster sizes (KMeansModel.summary.clusterSizes), which online
+    updates use as the centers' initial weights"""
+    with open(os.path.join(model_dir, CLUSTER_SIZES_FILE), 'w') as f:
+        json.dump([int(n) for n in cluster_sizes], f)
+
+def align_columns(X, ids, target_ids):
+    """Reorder/subset columns of X (labelled by ids) to target_ids; unseen targets stay empty"""
+    position = {r: j for j, r in enumerate(np.asarray(target_ids).tolist())}
+    cols = np.array([position.get(r, -1) for r in np.asarray(ids).tolist()], dtype=np.int64)
+    keep = np.flatnonzero(cols >= 0)
+    mapping = sp.csr_matrix((np.ones(len(keep)), (keep, cols[keep])),
+                            shape=(len(cols), len(position)))
+    return sp.csr_matrix(X @ mapping)
+
+class ClusterScorer:
+    """Scaler + nearest-center assignment in NumPy, with optional online center updates"""
+
+    def __init__(self, centers, std=None, mean=None, with_std=True, with_mean=False,
+                 reviewer_ids=None, weights=None, decay=1.0):
+        self.centers = np.asarray(centers, dtype=float)
+        k, d = self.centers.shape
+        self.std = np.ones(d) if std is None else np.asarray(std, dtype=float)
+        self.mean = np.zeros(d) if mean is None else np.asarray(mean, dtype=float)
+        self.with_std = with_std
+        self.with_mean = with_mean
+        self.reviewer_ids = None if reviewer_ids is None else np.asarray(reviewer_ids)
+        # Points behind each center; None until known from training or weigh_centers()
+        self.weights = None if weights is None else np.asarray(weights, dtype=float)
+        self.decay = decay
+
+    @classmethod
+    def from_spark(cls, model_dir, **kwargs):
+        """Load a saved PipelineModel (StandardScaler and KMeans stages are used)"""
+        stages = sorted(glob.glob(os.path.join(model_dir, 'stages', '*')),
+                        key=lambda path: int(os.path.basename(path).split('_', 1)[0]))
+        scaler, centers = {}, None
+        for stage_dir in stages:
+            name, params, rows = _read_stage(stage_dir)
+            if name == 'StandardScalerModel':
+                scaler = {'std': _read_vector(rows[0]['std']), 'mean': _read_vector(rows[0]['mean']),
+                          'with_std': params.get('withStd', True),
+                          'with_mean': params.get('withMean', False)}
+            elif name == 'KMeansModel':
+                rows = sorted(rows, key=lambda row: row['clusterIdx'])
+                centers = np.array([_read_vector(row['clusterCenter']) for row in rows])
+            elif name != 'VectorAssembler':
+                logging.warning(f"Ignoring pipeline stage {name}")
+        if centers is None:
+            raise ValueError(f"No KMeans stage found in {model_dir}")
+
+        ids_path = os.path.join(model_dir, REVIEWER_IDS_FILE)
+        if os.path.exists(ids_path) and 'reviewer_ids' not in kwargs:
+            with open(ids_path) as f:
+                kwargs['reviewer_ids'] = json.load(f)
+        sizes_path = os.path.join(model_dir, CLUSTER_SIZES_FILE)
+        if os.path.exists(sizes_path) and 'weights' not in kwargs:
+            with open(sizes_path) as f:
+                kwargs['weights'] = json.load(f)
+        elif 'weights' not in kwargs:
+            logging.warning(f"No {CLUSTER_SIZES_FILE} in {model_dir}; center weights are unknown "
+                            f"until weigh_centers() (--reference) sets them")
+        logging.info(f"Loaded {len(centers)} centers x {centers.shape[1]} features from {model_dir}")
+        return cls(centers, **scaler, **kwargs)
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        """Load a Spark model directory or an npz written by save()"""
+        if os.path.isdir(path):
+            return cls.from_spark(path, **kwargs)
+        with np.load(path) as f:
+            saved = {key: f[key] for key in f.files}
+        reviewer_ids = saved['reviewer_ids'] if saved['reviewer_ids'].size else None
+        weights = saved['weights'] if saved['weights'].size else None
+        return cls(saved['centers'], saved['std'], saved['mean'], bool(saved['with_std']),
+                   bool(saved['with_mean']), reviewer_ids, weights, float(saved['decay']),
+                   **kwargs)
+
+    def save(self, path):
+        """Save centers, scaler and update weights as npz"""
+        np.savez(path, centers=self.centers, std=self.std, mean=self.mean,
+                 with_std=self.with_std, with_mean=self.with_mean,
+                 weights=self.weights if self.weights is not None else np.zeros(0),
+                 decay=self.decay,
+                 reviewer_ids=self.reviewer_ids if self.reviewer_ids is not None else np.zeros(0))
+
+    def vectorize(self, triples):
+        """(CSR rows in the model's reviewer order, movie ids) from rating triples"""
+        from netflix_features import build_rating_matrix
+
+        if self.reviewer_ids is None:
+            raise ValueError("Model has no reviewer ids; save them with save_reviewer_ids()")
+        matrix, movie_ids, _ = build_rating_matrix(triples, self.reviewer_ids)
+        return matrix, movie_ids
+
+    def transform(self, X):
+        """Apply the saved StandardScaler (stays sparse unless withMean was set)"""
+        scale = np.divide(1, self.std, out=np.zeros_like(self.std), where=self.std > 0) \
+            if self.with_std else np.ones_like(self.std)
+        if self.with_mean:
+            X = (X.toarray() if sp.issparse(X) else np.asarray(X, dtype=float)) - self.mean
+            return X * scale
+        return sp.csr_matrix(X @ sp.diags(scale)) if sp.issparse(X) else np.asarray(X) * scale
+
+    def assign(self, X, batch_size=BATCH_SIZE, scaled=False):
+        """Cluster labels and squared distances for each row, batch by batch"""
+        n = X.shape[0]
+        labels = np.empty(n, dtype=np.int64)
+        distances = np.empty(n)
+        center_sq = np.einsum('ij,ij->i', self.centers, self.centers)
+        for start in range(0, n, batch_size):
+            batch = X[start:start + batch_size]
+            batch = batch if scaled else self.transform(batch)
+            d = row_sq_norms(batch)[:, None] - 2 * np.asarray(batch @ self.centers.T) + center_sq
+            labels[start:start + batch_size] = d.argmin(axis=1)
+            distances[start:start + batch_size] = np.maximum(d.min(axis=1), 0)
+        return labels, distances
+
+    def weigh_centers(self, X, batch_size=BATCH_SIZE):
+        """Set each center's weight to its cluster size in X (Spark doesn't save cluster sizes)"""
+        labels, _ = self.assign(X, batch_size)
+        self.weights = np.bincount(labels, minlength=len(self.centers)).astype(float)
+        return self
+
+    def update(self, X, batch_size=BATCH_SIZE):
+        """Online update of the centers from new rows (StreamingKMeans rule)
+
+        Each center becomes the weighted mean of its decayed previous self (weight
+        decay * w) and the new rows assigned to it. Returns the labels used.
+        """
+        if self.weights is None:
+            raise ValueError("Center weights are unknown; save the training cluster sizes with "
+                             "save_cluster_sizes() or weigh the centers with weigh_centers()")
+        X = self.transform(X)
+        labels, _ = self.assign(X, batch_size, scaled=True)
+        k = len(self.centers)
+        onehot = sp.csr_matrix((np.ones(len(labels)), (labels, np.arange(len(labels)))),
+                               shape=(k, len(labels)))
+        sums = onehot @ X
+        sums = np.asarray(sums.todense()) if sp.issparse(sums) else np.asarray(sums)
+        counts = np.bincount(labels, minlength=k).astype(float)
+
+        old = self.weights * self.decay
+        total = old + counts
+        hit = total > 0
+        self.centers[hit] = (self.centers[hit] * old[hit, None] + sums[hit]) / total[hit, None]
+        self.weights = total
+        return labels
+
+def benchmark(scorer, X, batch_size=BATCH_SIZE, repeats=3):
+    """Best-of-n assignment throughput in movies per second (scaling included)"""
+    best = np.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        scorer.assign(X, batch_size)
+        best = min(best, time.perf_counter() - start)
+    return X.shape[0] / best
+
+def main(argv=None):
+    """Assign movies to the saved KMeans clusters and optionally update the centers"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('model', help='Spark kmeans_model directory or npz from --save')
+    parser.add_argument('matrix', help='npz rating matrix from netflix_features.py')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--update', action='store_true', help='update centers from these movies')
+    parser.add_argument('--decay', type=float, default=None, help='forgetting factor for updates')
+    parser.add_argument('--reference', default=None,
+                        help='training matrix npz; weights the saved centers by cluster size')
+    parser.add_argument('--save', default=None, help='write the (updated) model to this npz')
+    parser.add_argument('--output', default=None, help='CSV of movie_id, prediction')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    from netflix_features import load_rating_matrix
+    scorer = ClusterScorer.load(args.model)
+    if args.decay is not None:
+        scorer.decay = args.decay
+    X, movie_ids, reviewer_ids = load_rating_matrix(args.matrix)
+
+    if scorer.reviewer_ids is not None and not np.array_equal(reviewer_ids, scorer.reviewer_ids):
+        X = align_columns(X, reviewer_ids, scorer.reviewer_ids)
+    if X.shape[1] != scorer.centers.shape[1]:
+        raise ValueError(f"Matrix has {X.shape[1]} features, model expects {scorer.centers.shape[1]}")
+
+    if args.reference:
+        reference, _, reference_ids = load_rating_matrix(args.reference)
+        if scorer.reviewer_ids is not None and not np.array_equal(reference_ids, scorer.reviewer_ids):
+            reference = align_columns(reference, reference_ids, scorer.reviewer_ids)
+        scorer.weigh_centers(reference, args.batch_size)
+
+    throughput = benchmark(scorer, X, args.batch_size)
+    labels = scorer.update(X, args.batch_size) if args.update else scorer.assign(X, args.batch_size)[0]
+    logging.info(f"Assigned {X.shape[0]} movies at {throughput:,.0f} movies/s; cluster sizes "
+                 f"{np.bincount(labels, minlength=len(scorer.centers)).tolist()}")
+
+    if args.output:
+        import pandas as pd
+        pd.DataFrame({'movie_id': movie_ids, 'prediction': labels}).to_csv(args.output, index=False)
+    if args.save:
+        scorer.save(args.save)
+        logging.info(f"Model saved to {args.save}")
+
+if __name__ == "__main__":
+    main()
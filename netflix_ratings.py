@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Netflix Ratings Ingestion
+Converts formatted_data.csv and movie_titles.csv once into Parquet with a declared compact
+schema (int32 ids, int8 ratings, date32 dates) instead of re-reading the multi-GB CSV with
+inferSchema on every run. Ratings are streamed in blocks and partitioned by movie-id bucket.
+
+Null movies and reviewer selections are applied as boolean bitmaps indexed by id, and
+top reviewers come from a streaming bincount over the user_id column only.
+The converted files are readable by pandas/pyarrow and by spark.read.parquet.
+
+Example:
+    python netflix_ratings.py formatted_data.csv movie_titles.csv --top 1000
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+
+import numpy as np
+import pyarrow as pa
+
+DEFAULT_RATINGS_DIR = 'netflix_ratings'
+DEFAULT_MOVIES_PATH = 'netflix_movies.parquet'
+
+RATINGS_SCHEMA = pa.schema([
+    ('movie_id', pa.int32()),
+    ('user_id', pa.int32()),
+    ('rating', pa.int8()),
+    ('date', pa.date32()),
+])
+MOVIES_SCHEMA = pa.schema([
+    ('movie_id', pa.int32()),
+    ('movie_year', pa.int16()),
+    ('movie_name', pa.string()),
+])
+
+# Movie ids per Parquet partition (movie_bucket=movie_id // MOVIE_BUCKET)
+MOVIE_BUCKET = 1000
+BLOCK_BYTES = 64 * 1024**2
+SOURCE_FILE = '_source.json'
+
+def _source_signature(path):
+    """Size and mtime of the source CSV; hashing a multi-GB file would cost a full read"""
+    stat = os.stat(path)
+    return {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+def convert_ratings(csv_path, out_dir=DEFAULT_RATINGS_DIR, refresh=False):
+    """Stream the ratings CSV into a movie_bucket-partitioned Parquet dataset (once)"""
+    import pyarrow.compute as pc
+    import pyarrow.csv as pv
+    import pyarrow.dataset as ds
+
+    signature = _source_signature(csv_path)
+    marker = os.path.join(out_dir, SOURCE_FILE)
+    if not refresh and os.path.exists(marker):
+        with open(marker) as f:
+            if json.load(f) == signature:
+                logging.info(f"{out_dir} is up to date with {csv_path}")
+                return out_dir
+
+    reader = pv.open_csv(
+        csv_path,
+        read_options=pv.ReadOptions(block_size=BLOCK_BYTES),
+        convert_options=pv.ConvertOptions(
+            column_types={f.name: f.type for f in RATINGS_SCHEMA},
+            include_columns=RATINGS_SCHEMA.names))
+
+    # Start from an empty directory so buckets missing from the new source don't linger
+    if os.path.exists(out_dir):
+        shutil.rmtree(out_dir)
+
+    schema = RATINGS_SCHEMA.append(pa.field('movie_bucket', pa.int16()))
+    n_rows = 0
+
+    def batches():
+        nonlocal n_rows
+        for batch in reader:
+            n_rows += batch.num_rows
+            bucket = pc.cast(pc.divide(batch.column('movie_id'), MOVIE_BUCKET), pa.int16())
+            yield pa.RecordBatch.from_arrays(
+                [batch.column(name) for name in RATINGS_SCHEMA.names] + [bucket], schema=schema)
+
+    ds.write_dataset(batches(), out_dir, schema=schema, format='parquet',
+                     partitioning=ds.partitioning(pa.schema([schema.field('movie_bucket')]),
+                                                  flavor='hive'),
+                     existing_data_behavior='delete_matching')
+    with open(marker, 'w') as f:
+        json.dump(signature, f)
+    logging.info(f"Converted {n_rows} ratings from {csv_path} to {out_dir}")
+    return out_dir
+
+def convert_movies(csv_path, out_path=DEFAULT_MOVIES_PATH, refresh=False):
+    """movie_titles.csv (no header; titles may contain commas, year may be NULL) to Parquet"""
+    import pyarrow.parquet as pq
+
+    if not refresh and os.path.exists(out_path) and \
+            os.path.getmtime(out_path) >= os.path.getmtime(csv_path):
+        return out_path
+
+    ids, years, names = [], [], []
+    with open(csv_path, encoding='latin-1') as f:
+        for line in f:
+            parts = line.rstrip('\r\n').split(',', 2)
+            if len(parts) < 3 or not parts[0].strip().isdigit():
+                continue
+            ids.append(int(parts[0]))
+            years.append(int(parts[1]) if parts[1].strip().isdigit() else None)
+            names.append(parts[2])
+
+    table = pa.Table.from_pydict({'movie_id': ids, 'movie_year': years, 'movie_name': names},
+                                 schema=MOVIES_SCHEMA)
+    pq.write_table(table, out_path)
+    logging.info(f"Converted {len(ids)} movies from {csv_path} to {out_path}")
+    return out_path
+
+def read_movies(path=DEFAULT_MOVIES_PATH):
+    """Movies table as a DataFrame"""
+    import pandas as pd
+
+    return pd.read_parquet(path)
+
+def id_bitmap(ids, size=None):
+    """Boolean array with True at each id, for O(1) membership tests on whole columns"""
+    ids = np.asarray(ids, dtype=np.int64)
+    size = int(ids.max()) + 1 if size is None and len(ids) else (size or 0)
+    bitmap = np.zeros(size, dtype=bool)
+    bitmap[ids] = True
+    return bitmap
+
+def valid_movie_bitmap(movies):
+    """Bitmap of movies with a known year and a real name (the notebook's null-movie filter)"""
+    valid = movies['movie_year'].notna() & (movies['movie_name'] != 'NULL')
+    return id_bitmap(movies.loc[valid, 'movie_id'], int(movies['movie_id'].max()) + 1)
+
+def _in_bitmap(bitmap, ids):
+    """Vectorized bitmap lookup; ids beyond the bitmap are not members"""
+    inside = ids < len(bitmap)
+    return inside & bitmap[np.where(inside, ids, 0)]
+
+def scan_ratings(ratings_dir=DEFAULT_RATINGS_DIR, columns=None, valid_movies=None,
+                 reviewers=None, movie_buckets=None):
+    """Yield rating DataFrames batch by batch, filtered by movie and reviewer bitmaps
+
+    `movie_buckets` prunes whole partitions before any data is read.
+    """
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(ratings_dir, format='parquet', partitioning='hive')
+    columns = list(columns or RATINGS_SCHEMA.names)
+    needed = list(dict.fromkeys(columns + [c for c, f in (('movie_id', valid_movies),
+                                                          ('user_id', reviewers)) if f is not None]))
+    predicate = None
+    if movie_buckets is not None:
+        predicate = ds.field('movie_bucket').isin(list(movie_buckets))
+
+    for batch in dataset.to_batches(columns=needed, filter=predicate):
+        if batch.num_rows == 0:
+            continue
+        df = batch.to_pandas()
+        mask = np.ones(len(df), dtype=bool)
+        if valid_movies is not None:
+            mask &= _in_bitmap(valid_movies, df['movie_id'].to_numpy())
+        if reviewers is not None:
+            mask &= _in_bitmap(reviewers, df['user_id'].to_numpy())
+        yield df.loc[mask, columns] if not mask.all() else df[columns]
+
+def reviewer_counts(ratings_dir=DEFAULT_RATINGS_DIR, valid_movies=None):
+    """Ratings per user id as a dense count array, one streaming pass over user_id"""
+    counts = np.zeros(0, dtype=np.int64)
+    for df in scan_ratings(ratings_dir, ['user_id'], valid_movies):
+        batch_counts = np.bincount(df['user_id'].to_numpy())
+        if len(batch_counts) > len(counts):
+            counts = np.concatenate([counts, np.zeros(len(batch_counts) - len(counts), dtype=np.int64)])
+        counts[:len(batch_counts)] += batch_counts
+    return counts
+
+def top_reviewers(counts, n=1000):
+    """Ids of the n most active reviewers in a reviewer_counts() array, most active first"""
+    n = min(n, int(np.count_nonzero(counts)))
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    top = np.argpartition(-counts, n - 1)[:n] if n < len(counts) else np.flatnonzero(counts)
+    return top[np.lexsort((top, -counts[top]))]
+
+def main(argv=None):
+    """Convert the Netflix CSVs to Parquet and report the most active reviewers"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('ratings', nargs='?', default='formatted_data.csv')
+    parser.add_argument('movies', nargs='?', default='movie_titles.csv')
+    parser.add_argument('--ratings-dir', default=DEFAULT_RATINGS_DIR)
+    parser.add_argument('--movies-path', default=DEFAULT_MOVIES_PATH)
+    parser.add_argument('--refresh', action='store_true', help='reconvert even if up to date')
+    parser.add_argument('--top', type=int, default=1000, help='number of top reviewers to report')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    convert_ratings(args.ratings, args.ratings_dir, args.refresh)
+    convert_movies(args.movies, args.movies_path, args.refresh)
+
+    movies = read_movies(args.movies_path)
+    valid = valid_movie_bitmap(movies)
+    logging.info(f"{len(movies) - valid.sum()} null movies excluded")
+
+    counts = reviewer_counts(args.ratings_dir, valid)
+    top = top_reviewers(counts, args.top)
+    print(f"{np.count_nonzero(counts)} reviewers; top {len(top)} account for "
+          f"{counts[top].sum()} of {counts.sum()} ratings "
+          f"(least active kept: {counts[top[-1]] if len(top) else 0} ratings)")
+
+if __name__ == "__main__":
+    main()
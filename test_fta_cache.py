@@ -0,0 +1,22 @@
+"""Regression checks for fta_cache.frame_digest on API-shaped frames"""
+
+import pandas as pd
+
+from fta_cache import frame_digest
+
+def _api_frame():
+    return pd.DataFrame({
+        'agency': ['MTA New York City Transit', 'MTA Bus'],
+        'incident_date': pd.to_datetime(['2021-03-15', '2022-07-01']),
+        'year_month': pd.PeriodIndex(['2021-03', '2022-07'], freq='M'),
+        'geolocation': [{'latitude': '40.7', 'longitude': '-73.9'},
+                        {'latitude': '40.8', 'longitude': '-73.8'}],
+    })
+
+def test_digest_handles_dict_and_period_columns():
+    assert frame_digest(_api_frame()) == frame_digest(_api_frame())
+
+def test_digest_changes_with_nested_values():
+    changed = _api_frame()
+    changed.at[1, 'geolocation'] = {'latitude': '40.9', 'longitude': '-73.8'}
+    assert frame_digest(changed) != frame_digest(_api_frame())
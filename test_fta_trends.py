@@ -0,0 +1,46 @@
+"""Regression checks for fta_trends.MonthlySeries event identity across sources"""
+
+import numpy as np
+import pandas as pd
+
+from fta_event_store import read_events, write_events
+from fta_trends import MonthlySeries
+
+def _api_events(n=300, seed=0):
+    """Events shaped like the Socrata download: string dates and a nested geolocation"""
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp('2019-01-01') + pd.to_timedelta(rng.integers(0, 4 * 365 * 24, n), unit='h')
+    return pd.DataFrame({
+        'agency': rng.choice(['MTA New York City Transit', 'MTA Bus', 'NJ Transit'], n),
+        'event_type': rng.choice(['Collision', 'Fire', 'Derailment'], n),
+        'incident_date': dates.strftime('%Y-%m-%dT%H:%M:%S.000'),
+        'total_fatalities': rng.poisson(0.3, n),
+        'geolocation': [{'latitude': '40.7', 'longitude': '-73.9'}] * n,
+    })
+
+def test_store_and_download_count_events_once(tmp_path):
+    events = _api_events()
+    store = tmp_path / 'events.sqlite'
+    write_events(events, store)
+    stored = read_events(store, columns=['agency', 'event_type', 'incident_date', 'total_fatalities'])
+
+    series = MonthlySeries()
+    assert series.update(stored) == len(events)
+    assert series.update(events) == 0
+    assert series.incidents.sum() == len(events)
+    assert series.fatalities.sum() == events['total_fatalities'].sum()
+
+def test_revised_fatalities_replace_earlier_count(tmp_path):
+    events = _api_events()
+    series = MonthlySeries()
+    series.update(events)
+
+    revised = events.copy()
+    revised.loc[:9, 'total_fatalities'] += 2
+    assert series.update(revised) == 10
+    assert series.incidents.sum() == len(events)
+    assert series.fatalities.sum() == revised['total_fatalities'].sum()
+
+    series.save(tmp_path / 'state.npz')
+    loaded = MonthlySeries.load(tmp_path / 'state.npz')
+    assert loaded.update(revised) == 0